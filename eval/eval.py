@@ -149,9 +149,7 @@ def main():
     parser.add_argument("--all", action="store_true")
     args = parser.parse_args()
 
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(
+    asyncio.run(
         eval(
             test_file=None if args.all else args.test,
             test_labels=args.labels,
@@ -156,9 +156,6 @@ async def main():
 if __name__ == "__main__":
     import asyncio
 
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    # asyncio.run(basic_model_eval(response, condition))
 
-    # loop.run_until_complete(basic_model_eval(response, condition))
-
-    loop.run_until_complete(main())
+    asyncio.run(main())
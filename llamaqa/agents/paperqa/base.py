@@ -25,6 +25,7 @@ from llama_index.llms.litellm import LiteLLM
 from ...llms import LiteLLMEmbeddingModel, LiteLLMModel
 from ...store.supabase_store import SupabaseStore
 from ...tools.paperqa_tools import PaperQAToolSpec
+from ...tools.utils import current_task_id
 from ...utils.cache import Cache
 from ...utils.logger import CostLogger
 from ...utils.policies import VALID_POLICIES
@@ -130,6 +131,7 @@ class PaperQAAgent(ReActAgent):
                 embedding_model=embedding_model,
                 summary_llm_model=summary_llm_model,
                 cost_logger=cost_logger,
+                evidence_cache=kwargs.get("evidence_cache", True),
             )
 
         llm = LiteLLM(llm_model_name)
@@ -180,208 +182,218 @@ class PaperQAAgent(ReActAgent):
         worker = cast(PaperQAAgentWorker, self.agent_worker)
         task = self.create_task(query)
 
-        self.toolspec.current_task_id = task.task_id.split("-")[0]
+        # Tag tool calls with the task, resetting the tag once the task is over
+        task_id_token = current_task_id.set(task.task_id.split("-")[0])
+        try:
+            iters = 0
+            max_iters = 10
+            step_queue = self.state.get_step_queue(task.task_id)
+            step = step_queue.popleft()
+
+            while True:
+                iters += 1
+                if iters >= max_iters:
+                    break
 
-        iters = 0
-        max_iters = 10
-        step_queue = self.state.get_step_queue(task.task_id)
-        step = step_queue.popleft()
+                if step.input is not None:
+                    add_user_step_to_reasoning(
+                        step,
+                        task.extra_state["new_memory"],
+                        task.extra_state["current_reasoning"],
+                        verbose=worker._verbose,
+                    )
 
-        while True:
-            iters += 1
-            if iters >= max_iters:
-                break
+                tools = worker.get_tools(task.input)
 
-            if step.input is not None:
-                add_user_step_to_reasoning(
-                    step,
-                    task.extra_state["new_memory"],
-                    task.extra_state["current_reasoning"],
-                    verbose=worker._verbose,
+                input_chat = worker._react_chat_formatter.format(
+                    tools,
+                    chat_history=task.memory.get(input=task.input)
+                    + task.extra_state["new_memory"].get_all(),
+                    current_reasoning=task.extra_state["current_reasoning"],
                 )
 
-            tools = worker.get_tools(task.input)
-
-            input_chat = worker._react_chat_formatter.format(
-                tools,
-                chat_history=task.memory.get(input=task.input)
-                + task.extra_state["new_memory"].get_all(),
-                current_reasoning=task.extra_state["current_reasoning"],
-            )
-
-            response_success = False
-            parse_success = False
-            num_retries = 3
-            retry_after = 3
-            current_retry = 0
-            while not response_success:
-                try:
-                    chat_stream = worker._llm.stream_chat(input_chat)
-
-                    response_buffer = ""
-                    for chunk in chat_stream:
-                        value = chunk.message.content[len(response_buffer) :]
-                        yield value
-                        response_buffer += value
-
-                    response_buffer = parse_action_response(response_buffer)
-                    is_done = infer_stream_chunk_is_final(response_buffer)
-                    if is_done:
-                        parse_success = True
-                        response_buffer = parse_answer_response(response_buffer)
-
-                    response_success = True
-                except (APIConnectionError, ServiceUnavailableError) as e:
-                    current_retry += 1
-                    if current_retry > num_retries:
-                        break
-                    logger.warn(
-                        str(e)
-                        + f"\nRetrying ({current_retry}/{num_retries}) after {retry_after}s..."
-                    )
-                    await asyncio.sleep(retry_after)
+                response_success = False
+                parse_success = False
+                num_retries = 3
+                retry_after = 3
+                current_retry = 0
+                while not response_success:
+                    try:
+                        chat_stream = await worker._llm.astream_chat(input_chat)
+
+                        response_buffer = ""
+                        async for chunk in chat_stream:
+                            value = chunk.message.content[len(response_buffer) :]
+                            yield value
+                            response_buffer += value
+
+                        response_buffer = parse_action_response(response_buffer)
+                        is_done = infer_stream_chunk_is_final(response_buffer)
+                        if is_done:
+                            parse_success = True
+                            response_buffer = parse_answer_response(response_buffer)
+
+                        response_success = True
+                    except (APIConnectionError, ServiceUnavailableError) as e:
+                        current_retry += 1
+                        if current_retry > num_retries:
+                            break
+                        logger.warn(
+                            str(e)
+                            + f"\nRetrying ({current_retry}/{num_retries}) after {retry_after}s..."
+                        )
+                        await asyncio.sleep(retry_after)
 
-            if iters == 1:
-                self.memory.put(ChatMessage(role=MessageRole.USER, content=query))
+                if iters == 1:
+                    self.memory.put(ChatMessage(role=MessageRole.USER, content=query))
             
-            if not response_success:
-                self.memory.put(
-                    ChatMessage(
-                        role=MessageRole.ASSISTANT, content=FALLBACK_RESPONSE_CONTENT
+                if not response_success:
+                    self.memory.put(
+                        ChatMessage(
+                            role=MessageRole.ASSISTANT, content=FALLBACK_RESPONSE_CONTENT
+                        )
                     )
-                )
-                yield FALLBACK_FINAL_RESPONSE
-                return
+                    yield FALLBACK_FINAL_RESPONSE
+                    return
 
-            if not is_done:
-                self.memory.put(
-                    ChatMessage(role=MessageRole.ASSISTANT, content=response_buffer)
-                )
-                tools = worker.get_tools(task.input)
-                tools_dict = {tool.metadata.get_name(): tool for tool in tools}
-
-                parse_success = False
-                # Extract tool to yield tool description
-                try:
-                    # Temporarily disable verbose to prevent repeated logging
-                    _verbose = worker._verbose
-                    worker._verbose = False
-                    _, current_reasoning, is_done = worker._extract_reasoning_step(
-                        response_buffer, is_streaming=True
+                if not is_done:
+                    self.memory.put(
+                        ChatMessage(role=MessageRole.ASSISTANT, content=response_buffer)
                     )
-                    worker._verbose = _verbose
-                    reasoning_step = cast(ActionReasoningStep, current_reasoning[-1])
-                    if reasoning_step.action in tools_dict:
-                        parse_success = True
-                        # Populate with default kwargs and log description
-                        if hasattr(
-                            tools_dict[reasoning_step.action].fn, "__default_kwargs__"
-                        ):
-                            reasoning_step.action_input = {
-                                **tools_dict[
-                                    reasoning_step.action
-                                ].fn.__default_kwargs__,
-                                **reasoning_step.action_input,
-                            }
-                        thought = f"""Action Desc: {
-                            tools_dict[reasoning_step.action].fn.__output_desc__.format(
-                                **reasoning_step.action_input
-                            )
-                        }"""
-                        # self.memory.put(ChatMessage(role=MessageRole.ASSISTANT, content=thought))
-                        yield thought
+                    tools = worker.get_tools(task.input)
+                    tools_dict = {tool.metadata.get_name(): tool for tool in tools}
 
-                        # given react prompt outputs, call tools or return response
-                        reasoning_steps, is_done = worker._process_actions(
-                            task, tools=tools, output=response_buffer, is_streaming=True
+                    parse_success = False
+                    # Extract tool to yield tool description
+                    try:
+                        # Temporarily disable verbose to prevent repeated logging
+                        _verbose = worker._verbose
+                        worker._verbose = False
+                        _, current_reasoning, is_done = worker._extract_reasoning_step(
+                            response_buffer, is_streaming=True
                         )
-                        if reasoning_steps[-1].observation.startswith("Found"):
-                            thought = (
-                                "Action Output:" + reasoning_steps[-1].observation.split(".")[0]
-                            )
+                        worker._verbose = _verbose
+                        reasoning_step = cast(ActionReasoningStep, current_reasoning[-1])
+                        if reasoning_step.action in tools_dict:
+                            parse_success = True
+                            # Read tool metadata off the toolspec method, since the
+                            # tool's sync fn is a generated wrapper for async tools
+                            tool_fn = getattr(self.toolspec, reasoning_step.action)
+                            # Populate with default kwargs and log description
+                            if hasattr(tool_fn, "__default_kwargs__"):
+                                reasoning_step.action_input = {
+                                    **tool_fn.__default_kwargs__,
+                                    **reasoning_step.action_input,
+                                }
+                            thought = f"""Action Desc: {
+                                tool_fn.__output_desc__.format(
+                                    **reasoning_step.action_input
+                                )
+                            }"""
                             # self.memory.put(ChatMessage(role=MessageRole.ASSISTANT, content=thought))
                             yield thought
-                        task.extra_state["current_reasoning"].extend(reasoning_steps)
 
-                        step = step.get_next_step(
-                            step_id=str(uuid.uuid4()),
-                            input=None,
-                        )
-                except ValueError:
-                    parse_success = False
-                    self.memory.put(ChatMessage(role=MessageRole.SYSTEM, content=FAILED_PARSING_PROMPT))
-
-                # Calculate cost with final chunk
-                cost = completion_cost(
-                    completion_response=ModelResponse(
-                        model=chunk.raw.model,
-                        usage=chunk.raw._hidden_params.get("usage"),
-                    ),
-                    custom_llm_provider=chunk.raw._hidden_params.get("custom_llm_provider"),
-                )
-                self.cost_logger.log_cost(cost)
-
-            # Check citations are valid
-            final_parsing_error = False
-            if is_done:
-                try:
-                    final_response = response_buffer.split("Answer:")[-1].strip()
-                    format_response(
-                        query,
-                        final_response,
-                        self.toolspec,
-                        prev_document_ids=document_ids or [],
-                    )
-                except ValueError as e:
-                    print(f"Error: {e}")
-                    final_parsing_error = True
-                    error_message = str(e)
-                    self.memory.put(
-                        ChatMessage(role=MessageRole.ASSISTANT, content=response_buffer)
+                            # given react prompt outputs, call tools or return response
+                            reasoning_steps, is_done = await worker._aprocess_actions(
+                                task, tools=tools, output=response_buffer, is_streaming=True
+                            )
+                            if reasoning_steps[-1].observation.startswith("Found"):
+                                thought = (
+                                    "Action Output:" + reasoning_steps[-1].observation.split(".")[0]
+                                )
+                                # self.memory.put(ChatMessage(role=MessageRole.ASSISTANT, content=thought))
+                                yield thought
+                            task.extra_state["current_reasoning"].extend(reasoning_steps)
+
+                            step = step.get_next_step(
+                                step_id=str(uuid.uuid4()),
+                                input=None,
+                            )
+                    except ValueError:
+                        parse_success = False
+                        self.memory.put(ChatMessage(role=MessageRole.SYSTEM, content=FAILED_PARSING_PROMPT))
+
+                    # Calculate cost with final chunk
+                    cost = completion_cost(
+                        completion_response=ModelResponse(
+                            model=chunk.raw.model,
+                            usage=chunk.raw._hidden_params.get("usage"),
+                        ),
+                        custom_llm_provider=chunk.raw._hidden_params.get("custom_llm_provider"),
                     )
-                    if error_message == "Incorrect citations":
-                        self.memory.put(ChatMessage(role=MessageRole.SYSTEM, content=FAILED_CITATION_PROMPT))
-                    elif error_message == "Found \"Thought:\"":
-                        self.memory.put(ChatMessage(role=MessageRole.SYSTEM, content=FAILED_THOUGHT_PROMPT))
-                    else:
-                        self.memory.put(ChatMessage(role=MessageRole.SYSTEM, content=FAILED_ANSWER_PROMPT))
+                    self.cost_logger.log_cost(cost)
 
-            if parse_success and not final_parsing_error:
-                if step_by_step:
-                    interrupt = input("Enter to continue or 'q' to quit: ")
-                    if interrupt == "q":
-                        quit()
+                # Check citations are valid
+                final_parsing_error = False
+                formatted_response = None
                 if is_done:
-                    break
+                    try:
+                        final_response = response_buffer.split("Answer:")[-1].strip()
+                        formatted_response = format_response(
+                            query,
+                            final_response,
+                            self.toolspec,
+                            prev_document_ids=document_ids or [],
+                        )
+                    except ValueError as e:
+                        print(f"Error: {e}")
+                        final_parsing_error = True
+                        formatted_response = None
+                        error_message = str(e)
+                        self.memory.put(
+                            ChatMessage(role=MessageRole.ASSISTANT, content=response_buffer)
+                        )
+                        if error_message == "Incorrect citations":
+                            self.memory.put(ChatMessage(role=MessageRole.SYSTEM, content=FAILED_CITATION_PROMPT))
+                        elif error_message == "Found \"Thought:\"":
+                            self.memory.put(ChatMessage(role=MessageRole.SYSTEM, content=FAILED_THOUGHT_PROMPT))
+                        else:
+                            self.memory.put(ChatMessage(role=MessageRole.SYSTEM, content=FAILED_ANSWER_PROMPT))
+
+                if parse_success and not final_parsing_error:
+                    if step_by_step:
+                        interrupt = input("Enter to continue or 'q' to quit: ")
+                        if interrupt == "q":
+                            quit()
+                    if is_done:
+                        break
 
-        final_response = response_buffer.split("Answer:")[-1].strip()
-        self.memory.put(ChatMessage(role=MessageRole.ASSISTANT, content=final_response))
+            final_response = response_buffer.split("Answer:")[-1].strip()
+            self.memory.put(ChatMessage(role=MessageRole.ASSISTANT, content=final_response))
 
-        # Suggest shortcut responses
-        suggested_responses = await suggest_follow_up(self)
+            # Suggest shortcut responses
+            suggested_responses = await suggest_follow_up(self)
 
-        recent_history = []
-        for i, message in enumerate(
-            self.memory.chat_store.to_dict()["store"]["chat_history"][::-1]
-        ):
-            if message["role"] == "assistant":
-                if i != 0:
-                    message["hidden"] = True
+            recent_history = []
+            for i, message in enumerate(
+                self.memory.chat_store.to_dict()["store"]["chat_history"][::-1]
+            ):
+                if message["role"] == "assistant":
+                    if i != 0:
+                        message["hidden"] = True
+                    else:
+                        # Reuse the response formatted while checking citations
+                        message["formattedContent"] = formatted_response or format_response(
+                            query,
+                            final_response,
+                            self.toolspec,
+                            prev_document_ids=document_ids or [],
+                        )
+                        message["formattedContent"][
+                            "suggestedResponses"
+                        ] = suggested_responses
+                    recent_history.insert(0, message)
                 else:
-                    message["formattedContent"] = format_response(
-                        query,
-                        final_response,
-                        self.toolspec,
-                        prev_document_ids=document_ids or [],
-                    )
-                    message["formattedContent"][
-                        "suggestedResponses"
-                    ] = suggested_responses
-                recent_history.insert(0, message)
-            else:
-                break
+                    break
 
-        yield "Final Response: " + json.dumps(recent_history)
+            yield "Final Response: " + json.dumps(recent_history)
+        finally:
+            try:
+                current_task_id.reset(task_id_token)
+            except ValueError:
+                # An abandoned stream is closed by the event loop's asyncgen
+                # finalizer in another context, where the tag was never set
+                pass
 
     def pprint_memory(self):
         class sty:
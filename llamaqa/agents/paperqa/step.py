@@ -2,7 +2,7 @@
 
 import json
 import uuid
-from typing import Dict, List, Sequence, Tuple, cast
+from typing import Dict, Generator, List, Sequence, Tuple, cast
 
 from llama_index.core.agent.react.step import (
     ReActAgentWorker,
@@ -85,13 +85,20 @@ class PaperQAAgentWorker(ReActAgentWorker):
 
         return message_content, current_reasoning, False
 
-    def _process_actions(
+    def _process_actions_steps(
         self,
         task: Task,
         tools: Sequence[AsyncBaseTool],
         output: ChatResponse,
         is_streaming: bool = False,
-    ) -> Tuple[List[BaseReasoningStep], bool]:
+    ) -> Generator[
+        Tuple[AsyncBaseTool, Dict], ToolOutput, Tuple[List[BaseReasoningStep], bool]
+    ]:
+        """Shared body of `_process_actions` and `_aprocess_actions`.
+
+        Yields the tool to call and its input, and expects the tool output to be
+        sent back or the tool's exception to be thrown in.
+        """
         tools_dict: Dict[str, AsyncBaseTool] = {
             tool.metadata.get_name(): tool for tool in tools
         }
@@ -126,7 +133,7 @@ class PaperQAAgentWorker(ReActAgentWorker):
                                 tool=tool.metadata,
                             )
                         )
-                        tool_output = tool.call(**reasoning_step.action_input)
+                        tool_output = yield tool, reasoning_step.action_input
                     except Exception as e:
                         tool_output = ToolOutput(
                             content=f"Error: {e!s}",
@@ -162,6 +169,46 @@ class PaperQAAgentWorker(ReActAgentWorker):
             tool.metadata.return_direct and not tool_output.is_error if tool else False,
         )
 
+    def _process_actions(
+        self,
+        task: Task,
+        tools: Sequence[AsyncBaseTool],
+        output: ChatResponse,
+        is_streaming: bool = False,
+    ) -> Tuple[List[BaseReasoningStep], bool]:
+        steps = self._process_actions_steps(task, tools, output, is_streaming)
+        try:
+            tool, kwargs = next(steps)
+            try:
+                tool_output = tool.call(**kwargs)
+            except Exception as e:
+                steps.throw(e)
+            else:
+                steps.send(tool_output)
+        except StopIteration as stop:
+            return stop.value
+        raise RuntimeError("Expected a single tool call per step")
+
+    async def _aprocess_actions(
+        self,
+        task: Task,
+        tools: Sequence[AsyncBaseTool],
+        output: ChatResponse,
+        is_streaming: bool = False,
+    ) -> Tuple[List[BaseReasoningStep], bool]:
+        steps = self._process_actions_steps(task, tools, output, is_streaming)
+        try:
+            tool, kwargs = next(steps)
+            try:
+                tool_output = await tool.acall(**kwargs)
+            except Exception as e:
+                steps.throw(e)
+            else:
+                steps.send(tool_output)
+        except StopIteration as stop:
+            return stop.value
+        raise RuntimeError("Expected a single tool call per step")
+
     def _run_step_stream(
         self,
         step: TaskStep,
@@ -4,7 +4,6 @@ Suggest follow-up responses for the user
 
 from typing import cast
 
-from dirtyjson.attributed_containers import AttributedList
 from llama_index.core.agent.react.step import add_user_step_to_reasoning
 
 from ...llms.llm_result import llm_parse_json
@@ -78,15 +77,16 @@ async def suggest_follow_up(agent):
             current_reasoning=task.extra_state["current_reasoning"],
         )
 
-        chat_stream = worker._llm.stream_chat(input_chat)
+        chat_stream = await worker._llm.astream_chat(input_chat)
 
         response_buffer = ""
-        for chunk in chat_stream:
+        async for chunk in chat_stream:
             value = chunk.message.content[len(response_buffer) :]
             response_buffer += value
 
         suggestions = llm_parse_json(response_buffer)
-        if type(suggestions) is not AttributedList:
+        # Strict JSON parses to a list, dirtyjson to an AttributedList subclass
+        if not isinstance(suggestions, list):
             return []
         else:
             return suggestions[:2]
@@ -1,5 +1,6 @@
 import re
 from collections import OrderedDict
+from functools import lru_cache
 from typing import List, Optional, cast
 
 from llama_index.core.callbacks import (CallbackManager, CBEventType,
@@ -38,16 +39,61 @@ def infer_stream_chunk_is_final(chunk: str) -> bool:
     return False
 
 
+@lru_cache(maxsize=1024)
+def name_pattern(name: str) -> re.Pattern:
+    return re.compile(rf"\b({re.escape(name.strip())})\b(?!\w)")
+
+
 def name_pos_in_text(name: str, text: str) -> int:
-    sname = name.strip()
-    pattern = rf"\b({re.escape(sname)})\b(?!\w)"
-    match = re.search(pattern, text)
+    match = name_pattern(name).search(text)
     if match:
         return match.start()
     else:
         return -1
 
 
+@lru_cache(maxsize=64)
+def names_pattern(names: tuple[str, ...]) -> tuple[re.Pattern, frozenset[str]]:
+    """Compile one pattern that finds every name in a single pass.
+
+    Returns the pattern and the names it can miss, which are checked
+    separately with `name_pos_in_text`. A name is missed when it is empty or
+    ends at a word boundary inside a longer name, since the scan only reports
+    the longest name at each position.
+    """
+    unique = sorted({n for n in names if n}, key=len, reverse=True)
+    pattern = re.compile(
+        rf"(?=\b({'|'.join(map(re.escape, unique))})\b(?!\w))"
+    )
+    shadowed = {n for n in names if not n}
+    for name in unique:
+        for other in unique:
+            if len(other) > len(name) and re.match(
+                rf"{re.escape(name)}\b(?!\w)", other
+            ):
+                shadowed.add(name)
+                break
+    return pattern, frozenset(shadowed)
+
+
+def names_pos_in_text(names: List[str], text: str) -> dict[str, int]:
+    """Batched `name_pos_in_text`, mapping each name found to its first position."""
+    names = tuple(n.strip() for n in names)
+    if not names:
+        return {}
+    pattern, shadowed = names_pattern(names)
+    positions = {}
+    for match in pattern.finditer(text):
+        positions.setdefault(match.group(1), match.start())
+    for name in shadowed:
+        position = name_pos_in_text(name, text)
+        if position >= 0:
+            positions[name] = position
+        else:
+            positions.pop(name, None)
+    return positions
+
+
 def format_response(
     query: str,
     response: str,
@@ -56,30 +102,24 @@ def format_response(
 ):
     answer_text = response
     # Format references
-    bib_positions = []
     if EXAMPLE_CITATION in answer_text:
         answer_text = answer_text.replace(EXAMPLE_CITATION, "")
-    for c in toolspec.cache.filtered_contexts():
-        # do check for whole key (so we don't catch Callahan2019a with Callahan2019)
-        position = name_pos_in_text(c.text.name, answer_text)
-        if position >= 0:
-            bib_positions.append(
-                {
-                    "bib": c,
-                    "pos": position,
-                }
-            )
-    bib_positions.sort(key=lambda x: x["pos"])
-    bib = OrderedDict()
-    for bib_pos in bib_positions:
-        citation = cast(Context, bib_pos["bib"])
-        bib[citation.text.name] = citation
+    contexts_by_name = toolspec.cache.filtered_contexts_by_name()
+    # do check for whole key (so we don't catch Callahan2019a with Callahan2019)
+    positions = names_pos_in_text(list(contexts_by_name), answer_text)
+    cited_names = sorted(
+        (name for name in contexts_by_name if name.strip() in positions),
+        key=lambda name: positions[name.strip()],
+    )
+    bib = OrderedDict((name, contexts_by_name[name]) for name in cited_names)
     bib_str = "\n\n".join(
-        [f"{i+1}. ({k}): {c.text.doc.citation}" for i, (k, c) in enumerate(bib.items())]
+        [f"{i}. ({k}): {c.text.doc.citation}" for i, (k, c) in enumerate(bib.items(), 1)]
+    )
+    formatted_answer = (
+        f"Question: {query}\n\n{answer_text}\n\nReferences\n\n{bib_str}\n"
+        if bib
+        else f"Question: {query}\n\n{answer_text}\n"
     )
-    formatted_answer = f"Question: {query}\n\n{answer_text}\n"
-    if bib:
-        formatted_answer += f"\nReferences\n\n{bib_str}\n"
     response = Answer(
         question=query,
         answer=answer_text,
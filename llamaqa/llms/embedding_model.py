@@ -1,12 +1,21 @@
+import asyncio
+import os
+import sqlite3
 from abc import ABC, abstractmethod
+from array import array
+from collections import Counter, OrderedDict
+from contextlib import closing
 from enum import StrEnum
+from functools import partial
 from typing import Any
+from weakref import WeakKeyDictionary
 
 import litellm
 import tiktoken
 from pydantic import (
     BaseModel,
     Field,
+    PrivateAttr,
     field_validator,
 )
 
@@ -23,6 +32,32 @@ EXTRA_TOKENS_FROM_USER_ROLE: int = 7
 
 MODEL_COST_MAP = litellm.get_model_cost_map("")
 
+# Query embeddings shared across model instances, keyed by (model name, query).
+# Each entry is a (possibly in-flight) batch request and the query's index in it
+QUERY_EMBEDDING_CACHE_SIZE: int = 4096
+_query_embeddings: OrderedDict[tuple[str, str], tuple[asyncio.Future, int]] = (
+    OrderedDict()
+)
+# Optional SQLite file that persists query embeddings across restarts
+QUERY_EMBEDDING_CACHE_PATH: str | None = os.environ.get("QUERY_EMBEDDING_CACHE_PATH")
+# Uncached queries arriving within this many seconds are embedded in one request
+QUERY_EMBEDDING_BATCH_WINDOW: float = 0.005
+# Counts of distinct queries per embed_queries call that were served from the
+# cache ("hits") or sent to the provider ("misses")
+_query_embedding_stats: Counter[str] = Counter()
+
+
+def query_embedding_cache_stats() -> dict[str, float]:
+    """Hits, misses, hit rate and current size of the query embedding cache."""
+    hits = _query_embedding_stats["hits"]
+    misses = _query_embedding_stats["misses"]
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        "size": len(_query_embeddings),
+    }
+
 
 class EmbeddingModes(StrEnum):
     DOCUMENT = "document"
@@ -38,6 +73,11 @@ class EmbeddingModel(ABC, BaseModel):
             " string for parsing"
         ),
     )
+    # Batch of uncached queries collecting until the batch window closes, per
+    # event loop since each batch's future belongs to the loop that created it
+    _pending_queries: WeakKeyDictionary[
+        asyncio.AbstractEventLoop, tuple[asyncio.Future, list[str]]
+    ] = PrivateAttr(default_factory=WeakKeyDictionary)
 
     async def check_rate_limit(self, token_count: float, **kwargs) -> None:
         # if "rate_limit" in self.config:
@@ -56,6 +96,146 @@ class EmbeddingModel(ABC, BaseModel):
     async def embed_documents(self, texts: list[str]) -> list[list[float]]:
         pass
 
+    async def embed_query(self, query: str) -> list[float]:
+        """Embed a single query, reusing the result for repeated queries.
+
+        Concurrent calls with the same query share one in-flight request.
+        """
+        return (await self.embed_queries([query]))[0]
+
+    async def embed_queries(self, queries: list[str]) -> list[list[float]]:
+        """Embed several queries, requesting all uncached queries in one batch.
+
+        Results are shared with `embed_query`, so later lookups of any of these
+        queries reuse the batch.
+        """
+        loop = asyncio.get_running_loop()
+        entries: dict[str, tuple[asyncio.Future, int]] = {}
+        missing: dict[str, None] = {}
+        for query in queries:
+            key = (self.name, query)
+            if query in entries or query in missing:
+                continue
+            if key in _query_embeddings and _can_await(_query_embeddings[key][0], loop):
+                _query_embeddings.move_to_end(key)
+                entries[query] = _query_embeddings[key]
+            else:
+                missing[query] = None
+        if missing and QUERY_EMBEDDING_CACHE_PATH:
+            persisted = await asyncio.to_thread(
+                _load_query_embeddings, self.name, list(missing)
+            )
+            for query, embedding in persisted.items():
+                future = loop.create_future()
+                future.set_result([embedding])
+                entries[query] = _query_embeddings[(self.name, query)] = (future, 0)
+                del missing[query]
+        _query_embedding_stats["hits"] += len(entries)
+        _query_embedding_stats["misses"] += len(missing)
+        if missing:
+            batch, offset = self._enqueue_queries(loop, list(missing))
+            batch_keys = [(self.name, query) for query in missing]
+            for i, (query, key) in enumerate(
+                zip(missing, batch_keys, strict=True), offset
+            ):
+                entries[query] = _query_embeddings[key] = (batch, i)
+            batch.add_done_callback(partial(_evict_failed_batch, batch_keys))
+            while len(_query_embeddings) > QUERY_EMBEDDING_CACHE_SIZE:
+                _query_embeddings.popitem(last=False)
+        return [
+            # Shield so that a cancelled caller does not cancel the shared request
+            (await asyncio.shield(future))[index]
+            for future, index in (entries[query] for query in queries)
+        ]
+
+    def _enqueue_queries(
+        self, loop: asyncio.AbstractEventLoop, queries: list[str]
+    ) -> tuple[asyncio.Future, int]:
+        """Add queries to the loop's pending batch, returning it and their offset."""
+        if loop not in self._pending_queries:
+            self._pending_queries[loop] = (loop.create_future(), [])
+            loop.call_later(QUERY_EMBEDDING_BATCH_WINDOW, self._flush_queries, loop)
+        batch, batch_queries = self._pending_queries[loop]
+        offset = len(batch_queries)
+        batch_queries.extend(queries)
+        return batch, offset
+
+    def _flush_queries(self, loop: asyncio.AbstractEventLoop) -> None:
+        batch, batch_queries = self._pending_queries.pop(loop)
+
+        def resolve(task: asyncio.Task) -> None:
+            if task.cancelled():
+                batch.cancel()
+            elif task.exception() is not None:
+                batch.set_exception(task.exception())
+            else:
+                batch.set_result(task.result())
+
+        task = asyncio.ensure_future(self._embed_and_persist(batch_queries))
+        task.add_done_callback(resolve)
+
+    async def _embed_and_persist(self, queries: list[str]) -> list[list[float]]:
+        embeddings = await self.embed_documents(queries)
+        if QUERY_EMBEDDING_CACHE_PATH:
+            await asyncio.to_thread(
+                _save_query_embeddings, self.name, queries, embeddings
+            )
+        return embeddings
+
+
+def _connect_query_embeddings() -> sqlite3.Connection:
+    conn = sqlite3.connect(QUERY_EMBEDDING_CACHE_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS query_embeddings"
+        " (model TEXT, query TEXT, embedding BLOB, PRIMARY KEY (model, query))"
+    )
+    return conn
+
+
+def _load_query_embeddings(model: str, queries: list[str]) -> dict[str, list[float]]:
+    with closing(_connect_query_embeddings()) as conn:
+        rows = conn.execute(
+            "SELECT query, embedding FROM query_embeddings"
+            f" WHERE model = ? AND query IN ({', '.join('?' * len(queries))})",
+            [model, *queries],
+        ).fetchall()
+    # Stored as float32, matching the precision the stores search at
+    return {query: array("f", embedding).tolist() for query, embedding in rows}
+
+
+def _save_query_embeddings(
+    model: str, queries: list[str], embeddings: list[list[float]]
+) -> None:
+    with closing(_connect_query_embeddings()) as conn, conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?)",
+            [
+                (model, query, array("f", embedding).tobytes())
+                for query, embedding in zip(queries, embeddings, strict=True)
+            ],
+        )
+
+
+def _can_await(future: asyncio.Future, loop: asyncio.AbstractEventLoop) -> bool:
+    """Whether a cached batch can be awaited on loop.
+
+    Batches from another loop may never finish if that loop has stopped, so only
+    their successful results are reused.
+    """
+    if future.get_loop() is loop:
+        return True
+    return future.done() and not future.cancelled() and future.exception() is None
+
+
+def _evict_failed_batch(keys: list[tuple[str, str]], batch: asyncio.Future) -> None:
+    """Drop a failed batch's queries from the cache so that they can be retried."""
+    if not batch.cancelled() and batch.exception() is None:
+        return
+    for key in keys:
+        entry = _query_embeddings.get(key)
+        if entry is not None and entry[0] is batch:
+            del _query_embeddings[key]
+
 
 class LiteLLMEmbeddingModel(EmbeddingModel):
     name: str = Field(default="text-embedding-3-small")
@@ -1,4 +1,5 @@
 import contextvars
+import json
 import logging
 import re
 from datetime import datetime
@@ -29,6 +30,17 @@ def find_json(rgx: str, text: str):
 def llm_parse_json(text: str) -> dict:
     """Read LLM output and extract JSON data from it."""
 
+    # Fast path for well-formed output: plain or ```json-fenced strict JSON
+    stripped = text.strip()
+    if stripped.startswith("```json") and stripped.endswith("```"):
+        stripped = stripped[len("```json") : -len("```")]
+    try:
+        fast_result = json.loads(stripped)
+        if isinstance(fast_result, (dict, list)):
+            return fast_result
+    except json.JSONDecodeError:
+        pass
+
     # First check for ```json
     code_snippet_pattern = r"```json(?P<json>(.|\s|\n)*?)```"
     code_snippet_result = find_json(code_snippet_pattern, text)
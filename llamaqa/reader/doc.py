@@ -1,5 +1,7 @@
+import hashlib
 import re
 from datetime import datetime
+from functools import cached_property
 from typing import Any, List, Optional
 
 import numpy as np
@@ -27,7 +29,13 @@ class Text(Embeddable):
             self.pages = self._get_pages_from_text_name(self.name)
 
     def __hash__(self) -> int:
-        return hash(self.text)
+        return self.content_hash
+
+    @cached_property
+    def content_hash(self) -> int:
+        """Stable 64-bit hash of the text, unaffected by PYTHONHASHSEED."""
+        digest = hashlib.blake2b(self.text.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little")
 
     @staticmethod
     def _get_pages_from_text_name(text_name: str):
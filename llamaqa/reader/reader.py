@@ -1,6 +1,6 @@
+import asyncio
 import logging
 import os
-import re
 from datetime import datetime
 from pathlib import Path
 from typing import Any, List, Optional, cast
@@ -16,6 +16,7 @@ from ..utils.utils import gather_with_concurrency
 from .doc import Doc, Point, Text
 from .parsing_settings import ParsingSettings
 from .utils import (
+    docname_from_citation,
     generate_dockey,
     maybe_is_text,
     read_doc,
@@ -58,7 +59,8 @@ class Reader(BaseModel):
             ]
         ):
             # Peek first chunk
-            texts = read_doc(
+            texts = await asyncio.to_thread(
+                read_doc,
                 path,
                 Doc(docname="", citation="", dockey=None),  # Fake doc
                 chunk_chars=self.parse_config.chunk_size,
@@ -119,22 +121,7 @@ class Reader(BaseModel):
 
         # Generate docname
         if docname is None:
-            # get first name and year from citation
-            match = re.search(r"([A-Z][a-z]+)", citation)
-            if match is not None:
-                author = match.group(1)
-            else:
-                # panicking - no word??
-                raise ValueError(
-                    f"Could not parse docname from citation {citation}. "
-                    "Consider just passing key explicitly - e.g. docs.py "
-                    "(path, citation, key='mykey')"
-                )
-            year = ""
-            match = re.search(r"(\d{4})", citation)
-            if match is not None:
-                year = match.group(1)
-            docname = f"{author}{year}"
+            docname = docname_from_citation(citation)
 
         doc = Doc(
             title=title,
@@ -183,38 +170,17 @@ class Reader(BaseModel):
         doc.embedding = abstract_emb
         return doc
 
-    async def read_doc(
-        self,
-        path: Path,
-        title: Optional[str] = None,
-        citation: Optional[str] = None,
-        abstract: Optional[str] = None,
-        authors: Optional[List[str]] | None = None,
-        published_at: Optional[str] = None,
-        doi: Optional[str] = None,
-        docname: str | None = None,
-        dockey: Any | None = None,
-        filepath: Optional[str] = None,
-        summarize_chunks=False,
-        **kwargs,
-    ) -> Doc:
-        doc = await self.get_metadata(
-            path,
-            title,
-            citation,
-            abstract,
-            authors,
-            published_at,
-            doi,
-            docname,
-            dockey,
-            filepath,
-        )
+    async def _read_and_chunk(self, path: Path) -> List[Text]:
+        """Read and chunk a document against a placeholder doc.
 
-        # Read document and chunk text
-        texts = read_doc(
+        Parsing runs in a worker thread so file I/O does not block the event loop.
+        The chunks are named with an empty docname, which is filled in by
+        `_attach_doc` once the metadata is known.
+        """
+        texts = await asyncio.to_thread(
+            read_doc,
             path,
-            doc,
+            Doc(docname="", citation="", dockey=None),  # Fake doc
             chunk_chars=self.parse_config.chunk_size,
             overlap=self.parse_config.overlap,
             page_size_limit=self.parse_config.page_size_limit,
@@ -233,30 +199,134 @@ class Reader(BaseModel):
                 f"This does not look like a text document: {path}. Pass disable_check"
                 f" to ignore this error. Contents: {texts}"
             )
+        return texts
 
-        for t, t_embedding in zip(
-            texts,
-            await self.embedding_model.embed_documents(texts=[t.text for t in texts]),
-            strict=True,
-        ):
+    @staticmethod
+    def _attach_doc(doc: Doc, texts: List[Text], embeddings: List[List[float]]) -> None:
+        for t, t_embedding in zip(texts, embeddings, strict=True):
             t.embedding = t_embedding
+            # Chunk names were built from the placeholder's empty docname
+            t.name = f"{doc.docname}{t.name}"
+            t.doc = doc
+        doc.texts = texts
+
+    async def _summarize_texts(self, texts: List[Text]) -> None:
+        results = await gather_with_concurrency(
+            n=4,
+            coros=[
+                summarize_chunk(
+                    text=text.text,
+                    llm_model=self.llm_model,
+                )
+                for text in texts
+            ],
+            progress=True,
+        )
+        for text, summary in zip(texts, results, strict=True):
+            text.summary = summary["summary"]
+            text.points = [Point(**p) for p in summary["points"]]
+
+    async def read_doc(
+        self,
+        path: Path,
+        title: Optional[str] = None,
+        citation: Optional[str] = None,
+        abstract: Optional[str] = None,
+        authors: Optional[List[str]] | None = None,
+        published_at: Optional[str] = None,
+        doi: Optional[str] = None,
+        docname: str | None = None,
+        dockey: Any | None = None,
+        filepath: Optional[str] = None,
+        summarize_chunks=False,
+        **kwargs,
+    ) -> Doc:
+        # Chunk first so that embedding the chunks can overlap
+        # with the metadata LLM call
+        texts = await self._read_and_chunk(path)
+
+        doc, embeddings = await asyncio.gather(
+            self.get_metadata(
+                path,
+                title,
+                citation,
+                abstract,
+                authors,
+                published_at,
+                doi,
+                docname,
+                dockey,
+                filepath,
+            ),
+            self.embedding_model.embed_documents(texts=[t.text for t in texts]),
+        )
+        self._attach_doc(doc, texts, embeddings)
 
         if summarize_chunks:
-            results = await gather_with_concurrency(
-                n=4,
+            await self._summarize_texts(texts)
+
+        return doc
+
+    async def read_docs(
+        self,
+        paths: List[Path],
+        doc_kwargs: Optional[List[dict[str, Any]]] = None,
+        summarize_chunks=False,
+        batch_size: int = 96,
+        max_concurrency: int = 8,
+    ) -> List[Doc]:
+        """Read several documents, embedding their chunks in shared batches.
+
+        Chunks from all documents are sorted by length and embedded in batches of
+        `batch_size`, so each request holds similarly sized texts, then scattered
+        back to their documents.
+
+        Args:
+            paths: local document paths
+            doc_kwargs: optional per-path metadata passed to `get_metadata`
+                e.g. title or citation
+            summarize_chunks: whether to summarize each chunk with the LLM
+            batch_size: number of chunks per embedding request
+            max_concurrency: maximum number of concurrent metadata or embedding
+                requests
+        """
+        doc_kwargs = doc_kwargs or [{} for _ in paths]
+        texts_per_doc = await asyncio.gather(
+            *(self._read_and_chunk(path) for path in paths)
+        )
+        all_texts = [t for texts in texts_per_doc for t in texts]
+
+        order = sorted(range(len(all_texts)), key=lambda i: len(all_texts[i].text))
+        batches = [order[i : i + batch_size] for i in range(0, len(order), batch_size)]
+        docs, batch_embeddings = await asyncio.gather(
+            gather_with_concurrency(
+                n=max_concurrency,
                 coros=[
-                    summarize_chunk(
-                        text=text.text,
-                        llm_model=self.llm_model,
+                    self.get_metadata(path, **kwargs)
+                    for path, kwargs in zip(paths, doc_kwargs, strict=True)
+                ],
+            ),
+            gather_with_concurrency(
+                n=max_concurrency,
+                coros=[
+                    self.embedding_model.embed_documents(
+                        texts=[all_texts[i].text for i in batch]
                     )
-                    for text in texts
+                    for batch in batches
                 ],
-                progress=True,
-            )
-            for text, summary in zip(texts, results, strict=True):
-                text.summary = summary["summary"]
-                text.points = [Point(**p) for p in summary["points"]]
+            ),
+        )
 
-        doc.texts = texts
+        embeddings: List[List[float]] = [[] for _ in all_texts]
+        for batch, batch_embedding in zip(batches, batch_embeddings, strict=True):
+            for i, embedding in zip(batch, batch_embedding, strict=True):
+                embeddings[i] = embedding
 
-        return doc
+        start = 0
+        for doc, texts in zip(docs, texts_per_doc, strict=True):
+            self._attach_doc(doc, texts, embeddings[start : start + len(texts)])
+            start += len(texts)
+            if summarize_chunks:
+                await self._summarize_texts(texts)
+
+        return docs
@@ -1,21 +1,31 @@
 from __future__ import annotations
 
+import functools
 import logging
 import math
+import multiprocessing as mp
 import os
 import re
 import string
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 from pathlib import Path
 from typing import ClassVar, Literal, overload
 from uuid import UUID, uuid5
 
+import numpy as np
 import pypdf
 import tiktoken
-from dirtyjson.attributed_containers import AttributedDict
 from html2text import __version__ as html2text_version
 from html2text import html2text
 from pydantic import BaseModel
 
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
 from llamaqa import __version__ as llamaqa_version
 
 from ..llms.llm_model import LLMModel
@@ -26,6 +36,32 @@ logger = logging.getLogger(__name__)
 
 NAMESPACE_CITATION = UUID("5345abad-94db-4db0-a1b1-6107ba7a4cb7")
 
+AUTHOR_PATTERN = re.compile(r"([A-Z][a-z]+)")
+YEAR_PATTERN = re.compile(r"(\d{4})")
+
+# Byte values of string.printable, used to restrict the entropy histogram
+PRINTABLE_MASK = np.zeros(256, dtype=bool)
+PRINTABLE_MASK[[ord(c) for c in string.printable]] = True
+
+# PDFs with at least this many pages are extracted across worker processes
+PDF_PARALLEL_PAGE_THRESHOLD = 64
+PDF_MAX_WORKERS = 8
+
+# Worker processes shared by all PDF extractions, started on first use
+_pdf_executor: ProcessPoolExecutor | None = None
+_pdf_executor_lock = threading.Lock()
+
+
+@functools.cache
+def get_cl100k_encoding() -> tiktoken.Encoding:
+    """Return the shared cl100k_base encoder, building it on first use."""
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def normalize_page_text(text: str) -> str:
+    """Drop null bytes and collapse whitespace runs into single spaces."""
+    return " ".join(text.replace("\x00", "").split())
+
 
 class ImpossibleParsingError(Exception):
     """Error to throw when a parsing is impossible."""
@@ -60,11 +96,13 @@ class ParsedText(BaseModel):
     def encode_content(self):
         # we tokenize using tiktoken so cuts are in reasonable places
         # See https://github.com/openai/tiktoken
-        enc = tiktoken.get_encoding("cl100k_base")
+        enc = get_cl100k_encoding()
         if isinstance(self.content, str):
             return enc.encode_ordinary(self.content)
         elif isinstance(self.content, list):
-            return [enc.encode_ordinary(c) for c in self.content]
+            return enc.encode_ordinary_batch(
+                self.content, num_threads=min(8, os.cpu_count() or 1)
+            )
         else:
             raise NotImplementedError(
                 "Encoding only implemented for str and list[str] content."
@@ -79,43 +117,90 @@ class ParsedText(BaseModel):
         return "\n\n".join(self.content.values())
 
 
-# def parse_pdf_to_pages(
-#     path: str | os.PathLike, page_size_limit: int | None = None
-# ) -> ParsedText:
-
-#     with pymupdf.open(path) as file:
-#         pages: dict[str, str] = {}
-#         total_length = 0
-
-#         for i in range(file.page_count):
-#             try:
-#                 page = file.load_page(i)
-#             except pymupdf.mupdf.FzErrorFormat as exc:
-#                 raise ImpossibleParsingError(
-#                     f"Page loading via {pymupdf.__name__} failed on page {i} of"
-#                     f" {file.page_count} for the PDF at path {path}, likely this PDF"
-#                     " file is corrupt."
-#                 ) from exc
-#             text = page.get_text("text", sort=True)
-#             if page_size_limit and len(text) > page_size_limit:
-#                 raise ImpossibleParsingError(
-#                     f"The text in page {i} of {file.page_count} was {len(text)} chars"
-#                     f" long, which exceeds the {page_size_limit} char limit for the PDF"
-#                     f" at path {path}."
-#                 )
-#             pages[str(i + 1)] = text
-#             total_length += len(text)
-
-#     metadata = ParsedMetadata(
-#         parsing_libraries=[f"pymupdf ({pymupdf.__version__})"],
-#         llamaqa_version=llamaqa_version,
-#         total_parsed_text_length=total_length,
-#         parse_type="pdf",
-#     )
-#     return ParsedText(content=pages, metadata=metadata)
+def get_pdf_executor() -> ProcessPoolExecutor:
+    """Get the process pool for PDF extraction, creating it on first use.
 
+    Workers are spawned rather than forked, as documents are read from threads
+    of the server process and forking a multithreaded process can deadlock.
+    """
+    global _pdf_executor
+    with _pdf_executor_lock:
+        if _pdf_executor is None:
+            _pdf_executor = ProcessPoolExecutor(
+                max_workers=min(PDF_MAX_WORKERS, os.cpu_count() or 1),
+                mp_context=mp.get_context("spawn"),
+            )
+    return _pdf_executor
+
+
+def _extract_pymupdf_page_range(
+    path: str | os.PathLike, start: int, stop: int
+) -> list[str]:
+    """Extract normalized text for pages [start, stop) with a private document handle."""
+    texts: list[str] = []
+    with pymupdf.open(path) as file:
+        for i in range(start, stop):
+            try:
+                page = file.load_page(i)
+            except pymupdf.mupdf.FzErrorFormat as exc:
+                raise ImpossibleParsingError(
+                    f"Page loading via {pymupdf.__name__} failed on page {i} of"
+                    f" {file.page_count} for the PDF at path {path}, likely this PDF"
+                    " file is corrupt."
+                ) from exc
+            text = page.get_text("text", sort=True)
+            texts.append(normalize_page_text(text))
+    return texts
 
-def parse_pdf_to_pages(
+
+def _parse_pdf_to_pages_pymupdf(
+    path: str | os.PathLike,
+    page_size_limit: int | None = None,
+    max_workers: int | None = None,
+) -> ParsedText:
+    with pymupdf.open(path) as file:
+        page_count = file.page_count
+
+    # MuPDF documents can't be shared across threads and hold the GIL,
+    # so large PDFs are split into page ranges across worker processes
+    max_workers = max_workers or min(PDF_MAX_WORKERS, os.cpu_count() or 1)
+    if page_count < PDF_PARALLEL_PAGE_THRESHOLD or max_workers < 2:
+        page_texts = _extract_pymupdf_page_range(path, 0, page_count)
+    else:
+        bounds = np.linspace(0, page_count, max_workers + 1, dtype=int)
+        page_texts = list(
+            chain.from_iterable(
+                get_pdf_executor().map(
+                    _extract_pymupdf_page_range,
+                    [path] * max_workers,
+                    bounds[:-1].tolist(),
+                    bounds[1:].tolist(),
+                )
+            )
+        )
+
+    pages: dict[str, str] = {}
+    total_length = 0
+    for i, text in enumerate(page_texts):
+        if page_size_limit and len(text) > page_size_limit:
+            raise ImpossibleParsingError(
+                f"The text in page {i} of {page_count} was {len(text)} chars"
+                f" long, which exceeds the {page_size_limit} char limit for the PDF"
+                f" at path {path}."
+            )
+        pages[str(i + 1)] = text
+        total_length += len(text)
+
+    metadata = ParsedMetadata(
+        parsing_libraries=[f"pymupdf ({pymupdf.__version__})"],
+        llamaqa_version=llamaqa_version,
+        total_parsed_text_length=total_length,
+        parse_type="pdf",
+    )
+    return ParsedText(content=pages, metadata=metadata)
+
+
+def _parse_pdf_to_pages_pypdf(
     path: str | os.PathLike, page_size_limit: int | None = None
 ) -> ParsedText:
     with open(path, "rb") as pdf_file:
@@ -124,7 +209,7 @@ def parse_pdf_to_pages(
         total_length = 0
         for i, page in enumerate(pdf_reader.pages):
             text = page.extract_text()
-            text = re.sub(r"[\s\n]+", " ", text).replace("\x00", "").strip()
+            text = normalize_page_text(text)
             if page_size_limit and len(text) > page_size_limit:
                 raise ImpossibleParsingError(
                     f"The text in page {i} was {len(text)} chars"
@@ -142,12 +227,19 @@ def parse_pdf_to_pages(
     return ParsedText(content=pages, metadata=metadata)
 
 
+def parse_pdf_to_pages(
+    path: str | os.PathLike, page_size_limit: int | None = None
+) -> ParsedText:
+    """Parse a PDF into page texts, preferring pymupdf and falling back to pypdf."""
+    if pymupdf is not None:
+        return _parse_pdf_to_pages_pymupdf(path, page_size_limit=page_size_limit)
+    return _parse_pdf_to_pages_pypdf(path, page_size_limit=page_size_limit)
+
+
 def chunk_pdf(
     parsed_text: ParsedText, doc: Doc, chunk_chars: int, overlap: int
 ) -> list[Text]:
-    pages: list[str] = []
     texts: list[Text] = []
-    split: str = ""
 
     if not isinstance(parsed_text.content, dict):
         raise NotImplementedError(
@@ -160,27 +252,40 @@ def chunk_pdf(
             f" {doc.dockey}, either empty or corrupted."
         )
 
+    # Slice chunks out of one concatenation by offset instead of
+    # repeatedly growing and re-slicing a split string
+    all_text = "".join(parsed_text.content.values())
+    start = 0  # offset of the current chunk in all_text
+    end = 0  # offset of the end of the pages seen so far
+    first_page = next(iter(parsed_text.content))  # first page of the current chunk
     for page_num, page_text in parsed_text.content.items():
-        split += page_text
-        pages.append(page_num)
-        # split could be so long it needs to be split
+        end += len(page_text)
+        # the pending text could be so long it needs to be split
         # into multiple chunks. Or it could be so short
         # that it needs to be combined with the next chunk.
-        while len(split) > chunk_chars:
-            # pretty formatting of pages (e.g. 1-3, 4, 5-7)
-            pg = "-".join([pages[0], pages[-1]])
-            texts.append(
-                Text(
-                    text=split[:chunk_chars], name=f"{doc.docname} pages {pg}", doc=doc
+        if end - start > chunk_chars:
+            # page range is fixed until the next page arrives (e.g. 1-3, 4-4, 5-7)
+            pg = f"{first_page}-{page_num}"
+            while end - start > chunk_chars:
+                texts.append(
+                    Text(
+                        text=all_text[start : start + chunk_chars],
+                        name=f"{doc.docname} pages {pg}",
+                        doc=doc,
+                    )
                 )
-            )
-            split = split[chunk_chars - overlap :]
-            pages = [page_num]
+                start += chunk_chars - overlap
+                pg = f"{page_num}-{page_num}"
+            first_page = page_num
 
-    if len(split) > overlap or not texts:
-        pg = "-".join([pages[0], pages[-1]])
+    if end - start > overlap or not texts:
+        pg = f"{first_page}-{page_num}"
         texts.append(
-            Text(text=split[:chunk_chars], name=f"{doc.docname} pages {pg}", doc=doc)
+            Text(
+                text=all_text[start : start + chunk_chars],
+                name=f"{doc.docname} pages {pg}",
+                doc=doc,
+            )
         )
     return texts
 
@@ -203,12 +308,16 @@ def parse_text(
             relevant when split_lines is True.
     """
     path = Path(path)
+    text: str | list[str]
     try:
-        with path.open() as f:
-            text = list(f) if split_lines else f.read()
+        text = path.read_text()
     except UnicodeDecodeError:
-        with path.open(encoding="utf-8", errors="ignore") as f:
-            text = f.read()
+        text = path.read_text(encoding="utf-8", errors="ignore")
+    if split_lines:
+        # Split on "\n" only, as iterating the file would, since str.splitlines
+        # also splits on characters like \x0c and \u2028
+        *lines, last = text.split("\n")
+        text = [line + "\n" for line in lines] + ([last] if last else [])
 
     parsing_libraries: list[str] = ["tiktoken (cl100k_base)"] if use_tiktoken else []
     if html:
@@ -256,7 +365,7 @@ def chunk_text(
     Currently ignored, but should explore more to make sure we don't miss anything.
     """
     texts: list[Text] = []
-    enc = tiktoken.get_encoding("cl100k_base")
+    enc = get_cl100k_encoding()
 
     if not isinstance(parsed_text.content, str):
         raise NotImplementedError(
@@ -278,15 +387,17 @@ def chunk_text(
     overlap_tokens = overlap / chars_per_token  # e.g., 100 / 5.5 = 18
     chunk_count = math.ceil(token_count / chunk_tokens)  # e.g., 4500 / 545 = 9
 
-    for i in range(chunk_count):
-        split = content[
-            max(int(i * chunk_tokens - overlap_tokens), 0) : int(
-                (i + 1) * chunk_tokens + overlap_tokens
-            )
-        ]
+    chunk_indices = np.arange(chunk_count)
+    starts = np.maximum((chunk_indices * chunk_tokens - overlap_tokens).astype(int), 0)
+    ends = ((chunk_indices + 1) * chunk_tokens + overlap_tokens).astype(int)
+    splits = [content[start:end] for start, end in zip(starts, ends, strict=True)]
+    if use_tiktoken:
+        splits = enc.decode_batch(splits)
+
+    for i, split in enumerate(splits):
         texts.append(
             Text(
-                text=enc.decode(split) if use_tiktoken else split,
+                text=split,
                 name=f"{doc.docname} chunk {i + 1}",
                 doc=doc,
             )
@@ -339,8 +450,7 @@ def read_doc(
     chunk_chars: int = ...,
     overlap: int = ...,
     page_size_limit: int | None = ...,
-) -> list[Text]:
-    ...
+) -> list[Text]: ...
 
 
 @overload
@@ -352,8 +462,7 @@ def read_doc(
     chunk_chars: int = ...,
     overlap: int = ...,
     page_size_limit: int | None = ...,
-) -> list[Text]:
-    ...
+) -> list[Text]: ...
 
 
 @overload
@@ -365,8 +474,7 @@ def read_doc(
     chunk_chars: int = ...,
     overlap: int = ...,
     page_size_limit: int | None = ...,
-) -> ParsedText:
-    ...
+) -> ParsedText: ...
 
 
 @overload
@@ -378,8 +486,7 @@ def read_doc(
     chunk_chars: int = ...,
     overlap: int = ...,
     page_size_limit: int | None = ...,
-) -> tuple[list[Text], ParsedMetadata]:
-    ...
+) -> tuple[list[Text], ParsedMetadata]: ...
 
 
 def read_doc(
@@ -459,19 +566,39 @@ def read_doc(
     return chunked_text
 
 
+@functools.lru_cache(maxsize=4096)
 def generate_dockey(citation: str) -> str:
     return str(uuid5(NAMESPACE_CITATION, citation))
 
 
+@functools.lru_cache(maxsize=4096)
+def docname_from_citation(citation: str) -> str:
+    # get first name and year from citation
+    match = AUTHOR_PATTERN.search(citation)
+    if match is None:
+        # panicking - no word??
+        raise ValueError(
+            f"Could not parse docname from citation {citation}. "
+            "Consider just passing key explicitly - e.g. docs.py "
+            "(path, citation, key='mykey')"
+        )
+    author = match.group(1)
+    year = ""
+    match = YEAR_PATTERN.search(citation)
+    if match is not None:
+        year = match.group(1)
+    return f"{author}{year}"
+
+
 def maybe_is_text(s: str, thresh: float = 2.5) -> bool:
     if not s:
         return False
-    # Calculate the entropy of the string
-    entropy = 0.0
-    for c in string.printable:
-        p = s.count(c) / len(s)
-        if p > 0:
-            entropy += -p * math.log2(p)
+    # Calculate the entropy of the string over printable characters
+    buf = np.frombuffer(s.encode("utf-8", "ignore"), dtype=np.uint8)
+    counts = np.bincount(buf, minlength=256)
+    counts = counts[PRINTABLE_MASK & (counts > 0)]
+    p = counts / len(s)
+    entropy = float(-(p * np.log2(p)).sum())
 
     # Check if the entropy is within a reasonable range for text
     return entropy > thresh
@@ -532,7 +659,7 @@ async def summarize_chunk(text: str, llm_model: LLMModel, max_tries: int = 5):
         except ValueError:
             logger.warning(f"Failed to generate summary from: {result}, retrying...")
         if (
-            type(summary_json) is AttributedDict
+            isinstance(summary_json, dict)
             and "summary" in summary_json
             and "points" in summary_json
         ):
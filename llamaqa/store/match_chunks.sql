@@ -1,30 +1,74 @@
+-- Approximate nearest neighbour index so match_chunks does not scan every chunk
+create index if not exists chunks_text_emb_hnsw_idx
+on chunks using hnsw (text_emb vector_cosine_ops)
+with (m = 16, ef_construction = 64);
+
+-- Chunks of given documents, for the exact scan when match_chunks is filtered
+create index if not exists chunks_document_idx
+on chunks (document);
+
+-- HNSW applies the where clause after the index search, which only returns
+-- the hnsw.ef_search nearest candidates. So:
+-- - Unfiltered queries use the index, with ef_search raised above match_count
+--   (at the cost of some speed, recall stays approximate)
+-- - Queries filtered by document_ids scan those documents' chunks exactly,
+--   since a selective filter could otherwise return fewer than match_count rows
 create or replace function match_chunks (
   query_embedding vector(768),
   match_threshold float,
-  match_count int
+  match_count int,
+  document_ids uuid[] default '{}'
 )
 returns table (
   id uuid,
-  doc uuid,
-  doc_title text,
+  doc_id uuid,
+  doc_citation text,
+  doc_filepath text,
   pages int[],
   text text,
   text_emb vector(768),
   similarity float
 )
-language sql stable
+language plpgsql stable
+set hnsw.ef_search = 100
 as $$
-  select
-    chunks.id,
-    chunks.document as doc,
-    documents.title as doc_title,
-    chunks.pages,
-    chunks.text,
-    chunks.text_emb,
-    1 - (chunks.text_emb <=> query_embedding) as similarity
-  from chunks
-  left join documents on chunks.document = documents.id
-  where chunks.text_emb <=> query_embedding < 1 - match_threshold
-  order by chunks.text_emb <=> query_embedding
-  limit match_count;
+#variable_conflict use_column
+begin
+  if cardinality(document_ids) = 0 then
+    return query
+    select
+      chunks.id,
+      chunks.document as doc_id,
+      documents.citation as doc_citation,
+      documents.filepath as doc_filepath,
+      chunks.pages,
+      chunks.text,
+      chunks.text_emb,
+      1 - (chunks.text_emb <=> query_embedding) as similarity
+    from chunks
+    left join documents on chunks.document = documents.id
+    where chunks.text_emb <=> query_embedding < 1 - match_threshold
+    order by chunks.text_emb <=> query_embedding
+    limit match_count;
+  else
+    return query
+    select
+      chunks.id,
+      chunks.document as doc_id,
+      documents.citation as doc_citation,
+      documents.filepath as doc_filepath,
+      chunks.pages,
+      chunks.text,
+      chunks.text_emb,
+      1 - (chunks.text_emb <=> query_embedding) as similarity
+    from chunks
+    left join documents on chunks.document = documents.id
+    where chunks.document = any(document_ids)
+      and chunks.text_emb <=> query_embedding < 1 - match_threshold
+    -- Ordering by an expression rather than the bare distance keeps the
+    -- planner from using the HNSW index
+    order by (chunks.text_emb <=> query_embedding) + 0
+    limit match_count;
+  end if;
+end;
 $$;
@@ -9,12 +9,92 @@ from pydantic import (
     Field,
 )
 
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+
 from llamaqa.reader.doc import Text
 
+SIMSIMD_AVAILABLE = simsimd is not None
+
+
+def normalize_embeddings(embeddings) -> np.ndarray:
+    """L2-normalize each row of `embeddings` as a contiguous float32 matrix."""
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    return embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12)
+
 
 def cosine_similarity(a, b):
-    norm_product = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
-    return a @ b.T / norm_product
+    return normalize_embeddings(a) @ normalize_embeddings(b).T
+
+
+def query_similarity(query, embeddings: np.ndarray) -> np.ndarray:
+    """Cosine similarity of a query vector against each row of `embeddings`.
+
+    `embeddings` must already be L2-normalized (see `normalize_embeddings`), so
+    only the query is normalized here and the similarity is a plain dot product,
+    computed with SimSIMD when it is installed and a BLAS matrix-vector product
+    otherwise.
+    """
+    query = normalize_embeddings(np.reshape(query, (1, -1)))
+    if simsimd is not None:
+        return np.asarray(simsimd.cdist(query, embeddings, metric="dot"))[0]
+    return embeddings @ query[0]
+
+
+def quantize_embeddings(embeddings) -> np.ndarray:
+    """Scale each row of `embeddings` by its max magnitude into int8."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    scale = np.abs(embeddings).max(axis=1, keepdims=True) + 1e-12
+    return np.round(embeddings / scale * 127).astype(np.int8)
+
+
+def quantized_query_similarity(query, embeddings_i8: np.ndarray) -> np.ndarray:
+    """Approximate cosine similarity of a query vector against int8 rows.
+
+    `embeddings_i8` comes from `quantize_embeddings`, which reads a quarter of the
+    memory per row compared to float32. Requires SimSIMD for its int8 kernels.
+    """
+    query_i8 = quantize_embeddings(np.reshape(query, (1, -1)))
+    return 1 - np.asarray(simsimd.cdist(query_i8, embeddings_i8, metric="cosine"))[0]
+
+
+def maximal_marginal_relevance(
+    embeddings, scores, k: int, mmr_lambda: float
+) -> list[int]:
+    """Greedily pick `k` indices trading off relevance against redundancy.
+
+    `scores` must be sorted in descending order, so index 0 is always picked first.
+    Instead of re-reducing over every selected column, a running max similarity
+    to the selected set is updated with one vectorized pass per pick. Only the
+    similarities to picked rows are computed, rather than the full pairwise matrix.
+    """
+    embeddings = normalize_embeddings(embeddings)
+    relevance = mmr_lambda * np.asarray(scores, dtype=np.float32)
+    # Buffers reused across picks so the loop does not allocate
+    mmr_scores = np.empty_like(relevance)
+    sim_to_pick = np.empty_like(relevance)
+
+    selected_indices = [0]
+    selected_mask = np.zeros(len(relevance), dtype=bool)
+    selected_mask[0] = True
+    # Running max similarity of each text to the selected set
+    max_sim_to_selected = embeddings @ embeddings[0]
+
+    while len(selected_indices) < k:
+        np.multiply(max_sim_to_selected, 1 - mmr_lambda, out=mmr_scores)
+        np.subtract(relevance, mmr_scores, out=mmr_scores)
+        mmr_scores[selected_mask] = -np.inf  # Exclude already selected documents
+
+        max_mmr_index = int(mmr_scores.argmax())
+        selected_indices.append(max_mmr_index)
+        selected_mask[max_mmr_index] = True
+        # Rows are normalized, so similarity to the new pick is a single GEMV
+        np.dot(embeddings, embeddings[max_mmr_index], out=sim_to_pick)
+        np.maximum(max_sim_to_selected, sim_to_pick, out=max_sim_to_selected)
+
+    return selected_indices
 
 
 class VectorStore(BaseModel, ABC):
@@ -27,14 +107,14 @@ class VectorStore(BaseModel, ABC):
     texts_hashes: set[int] = Field(default_factory=set)
 
     def __contains__(self, item) -> bool:
-        return hash(item) in self.texts_hashes
+        return item.content_hash in self.texts_hashes
 
     def __len__(self) -> int:
         return len(self.texts_hashes)
 
     @abstractmethod
     def add_texts_and_embeddings(self, texts: Iterable[Any]) -> None:
-        self.texts_hashes.update(hash(t) for t in texts)
+        self.texts_hashes.update(t.content_hash for t in texts)
 
     @abstractmethod
     async def similarity_search(
@@ -67,26 +147,9 @@ class VectorStore(BaseModel, ABC):
         if len(texts) <= k or self.mmr_lambda >= 1.0:
             return texts, scores
 
-        embeddings = np.array([t.embedding for t in texts])
-        np_scores = np.array(scores)
-        similarity_matrix = cosine_similarity(embeddings, embeddings)
-
-        selected_indices = [0]
-        remaining_indices = list(range(1, len(texts)))
-
-        while len(selected_indices) < k:
-            selected_similarities = similarity_matrix[:, selected_indices]
-            max_sim_to_selected = selected_similarities.max(axis=1)
-
-            mmr_scores = (
-                self.mmr_lambda * np_scores
-                - (1 - self.mmr_lambda) * max_sim_to_selected
-            )
-            mmr_scores[selected_indices] = -np.inf  # Exclude already selected documents
-
-            max_mmr_index = mmr_scores.argmax()
-            selected_indices.append(max_mmr_index)
-            remaining_indices.remove(max_mmr_index)
+        selected_indices = maximal_marginal_relevance(
+            [t.embedding for t in texts], scores, k, self.mmr_lambda
+        )
 
         return [texts[i] for i in selected_indices], [
             scores[i] for i in selected_indices
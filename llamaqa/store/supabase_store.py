@@ -1,63 +1,75 @@
+import asyncio
 import json
-import re
 from collections.abc import Iterable, Sequence
+from itertools import chain
 from typing import Any, List, Optional
+from weakref import WeakKeyDictionary
 
 import numpy as np
 from postgrest.exceptions import APIError
-from pydantic import Field
+from pydantic import Field, PrivateAttr
+from supabase._async.client import AsyncClient
 from supabase._async.client import create_client as create_async_client
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from ..llms.embedding_model import EmbeddingModel
 from ..reader.doc import Doc, Point, Text
+from ..reader.utils import docname_from_citation
 from ..utils.embeddable import Embeddable
 from ..utils.policies import POLICY_IDS
 from ..utils.utils import gather_with_concurrency
-from .store import VectorStore, cosine_similarity
-from .utils import upload_chunk
+from .store import (
+    SIMSIMD_AVAILABLE,
+    VectorStore,
+    maximal_marginal_relevance,
+    normalize_embeddings,
+    quantize_embeddings,
+    quantized_query_similarity,
+    query_similarity,
+)
+from .utils import upload_chunks
+
+
+def parse_vector(value: str) -> list[float]:
+    """Parse a pgvector in its text form e.g. "[0.1,0.2]" into a list of floats."""
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
 
 
 def response_to_text(data: List) -> List[Text]:
     texts = []
+    # Many chunks share a document, so parse each docname once per dockey.
+    # Each chunk still gets its own Doc, since callers rename them in place
+    docnames: dict[str, str] = {}
     for chunk in data:
-        docname = None
         document = chunk.get("document")
         dockey = document.get("id")
         citation = document.get("citation")
-        if docname is None:
-            # get first name and year from citation
-            match = re.search(r"([A-Z][a-z]+)", citation)
-            if match is not None:
-                author = match.group(1)
-            else:
-                # panicking - no word??
-                raise ValueError(
-                    f"Could not parse docname from citation {citation}. "
-                    "Consider just passing key explicitly - e.g. docs.py "
-                    "(path, citation, key='mykey')"
-                )
-            year = ""
-            match = re.search(r"(\d{4})", citation)
-            if match is not None:
-                year = match.group(1)
-            docname = f"{author}{year}"
+        if dockey not in docnames:
+            docnames[dockey] = docname_from_citation(citation)
+        doc = Doc(
+            dockey=dockey,
+            citation=citation,
+            docname=docnames[dockey],
+            filepath=document.get("filepath"),
+        )
         pages = chunk.get("pages")
-        pages_str = " pages " + f"{pages[0]}-{pages[-1]}"
+        pages_str = f" pages {pages[0]}-{pages[-1]}"
 
         points = [Point(**p) for p in chunk.get("points", [])]
 
         texts.append(
             Text(
                 text=chunk.get("text"),
-                name=docname + pages_str,
-                doc=Doc(
-                    dockey=dockey,
-                    citation=citation,
-                    docname=docname,
-                    filepath=document.get("filepath"),
-                ),
-                pages=chunk.get("pages"),
-                embedding=json.loads(chunk.get("text_emb")),
+                name=doc.docname + pages_str,
+                doc=doc,
+                pages=pages,
+                embedding=parse_vector(chunk.get("text_emb")),
                 summary=chunk.get("summary"),
                 points=points,
             )
@@ -67,35 +79,91 @@ def response_to_text(data: List) -> List[Text]:
 
 class SupabaseStore(VectorStore):
     texts: list[Embeddable] = []
+    # Growable float32 buffer of L2-normalized embeddings,
+    # the first `_num_embeddings` rows are valid
     _embeddings_matrix: np.ndarray | None = None
+    _num_embeddings: int = 0
+    # int8 copy of the embeddings, built lazily when `int8_search` is enabled
+    _embeddings_i8: np.ndarray | None = None
+    # One client per store and event loop, so its connection pool is reused
+    # across calls without leaking into a later loop e.g. from asyncio.run
+    _clients: WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncClient] = PrivateAttr(
+        default_factory=WeakKeyDictionary
+    )
+    _client_locks: WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock] = (
+        PrivateAttr(default_factory=WeakKeyDictionary)
+    )
+    # Raw chunk rows from get_all_policy_info, keyed by document ids
+    _policy_chunks: dict[frozenset[str], list] = PrivateAttr(default_factory=dict)
     supabase_url: str = Field()
     supabase_key: str = Field()
+    # Score the offline corpus on int8-quantized embeddings if SimSIMD is installed
+    int8_search: bool = Field(default=False)
+
+    async def _get_client(self) -> AsyncClient:
+        loop = asyncio.get_running_loop()
+        # Open connections can keep their loop alive, so drop closed loops' clients
+        for closed_loop in [lp for lp in self._clients if lp.is_closed()]:
+            del self._clients[closed_loop]
+            self._client_locks.pop(closed_loop, None)
+        lock = self._client_locks.setdefault(loop, asyncio.Lock())
+        async with lock:
+            if loop not in self._clients:
+                self._clients[loop] = await create_async_client(
+                    self.supabase_url, self.supabase_key
+                )
+        return self._clients[loop]
 
     def clear(self) -> None:
         super().clear()
         self.texts = []
         self._embeddings_matrix = None
+        self._num_embeddings = 0
+        self._embeddings_i8 = None
+        self._policy_chunks = {}
 
     def add_texts_and_embeddings(self, texts: Iterable[Embeddable]) -> None:
+        texts = list(texts)
         super().add_texts_and_embeddings(texts)
         self.texts.extend(texts)
-        self._embeddings_matrix = np.array([t.embedding for t in self.texts])
+        if texts:
+            self._append_embeddings(normalize_embeddings([t.embedding for t in texts]))
+
+    def _append_embeddings(self, embeddings: np.ndarray) -> None:
+        """Copy rows into the embeddings buffer, doubling its capacity on overflow."""
+        start = self._num_embeddings
+        stop = start + len(embeddings)
+        if self._embeddings_matrix is None or stop > len(self._embeddings_matrix):
+            capacity = max(stop, 2 * start, 64)
+            buffer = np.empty((capacity, embeddings.shape[1]), dtype=np.float32)
+            if self._embeddings_matrix is not None:
+                buffer[:start] = self._embeddings_matrix[:start]
+            self._embeddings_matrix = buffer
+        self._embeddings_matrix[start:stop] = embeddings
+        self._num_embeddings = stop
+        self._embeddings_i8 = None
 
     async def get_all_policy_info(self, policies: List[str]):
-        document_ids = set(sum([POLICY_IDS[p] for p in policies], []))
+        document_ids = set(chain.from_iterable(POLICY_IDS[p] for p in policies))
         # Support offline retrieval
         if self.texts:
-            return [t for t in self.texts if t["dockey"] in document_ids]
-        # Support Supabase retrieval
-        supabase = await create_async_client(self.supabase_url, self.supabase_key)
-        response = (
-            await supabase.table("chunks")
-            .select("document(id,citation,filepath),pages,text,text_emb,summary,points")
-            .or_(",".join([f"document.eq.{d}" for d in document_ids]))
-            .not_.is_("summary", "null")
-            .execute()
-        )
-        return response_to_text(response.data)
+            return [t for t in self.texts if t.doc.dockey in document_ids]
+        # Support Supabase retrieval, fetching the rows for each set of policies once
+        cache_key = frozenset(document_ids)
+        if cache_key not in self._policy_chunks:
+            supabase = await self._get_client()
+            response = (
+                await supabase.table("chunks")
+                .select(
+                    "document(id,citation,filepath),pages,text,text_emb,summary,points"
+                )
+                .or_(",".join([f"document.eq.{d}" for d in document_ids]))
+                .not_.is_("summary", "null")
+                .execute()
+            )
+            self._policy_chunks[cache_key] = response.data
+        # Build fresh Texts on every call since callers rename them in place
+        return response_to_text(self._policy_chunks[cache_key])
 
     async def pgvector_search(
         self,
@@ -105,12 +173,12 @@ class SupabaseStore(VectorStore):
         k: int = 10,
         document_ids: Optional[List[str]] = None,
     ):
-        supabase = await create_async_client(self.supabase_url, self.supabase_key)
-        np_query = np.array((await embedding_model.embed_documents([query]))[0])
+        supabase = await self._get_client()
+        query_embedding = await embedding_model.embed_query(query)
         response = await supabase.rpc(
             "match_chunks",
             {
-                "query_embedding": list(np_query),
+                "query_embedding": query_embedding,
                 "match_threshold": match_threshold,
                 "match_count": k,
                 "document_ids": document_ids or [],
@@ -142,19 +210,27 @@ class SupabaseStore(VectorStore):
         policies: Optional[List[str]] = None,
     ) -> tuple[Sequence[Text], list[float]]:
         policies = policies or []
-        document_ids = list(set(sum([POLICY_IDS[p] for p in policies], [])))
+        document_ids = list(set(chain.from_iterable(POLICY_IDS[p] for p in policies)))
         # Support offline retrieval
         if self.texts:
-            self._embeddings_matrix = np.array([t.embedding for t in self.texts])
-            k = min(k, len(self.texts))
+            texts = self.texts
+            k = min(k, len(texts))
             if k == 0:
                 return [], []
 
-            np_query = np.array((await embedding_model.embed_documents([query]))[0])
+            np_query = np.asarray(
+                await embedding_model.embed_query(query), dtype=np.float32
+            )
 
-            similarity_scores = cosine_similarity(
-                np_query.reshape(1, -1), self._embeddings_matrix
-            )[0]
+            embeddings = self._embeddings_matrix[: self._num_embeddings]
+            if self.int8_search and SIMSIMD_AVAILABLE:
+                if self._embeddings_i8 is None:
+                    self._embeddings_i8 = quantize_embeddings(embeddings)
+                similarity_scores = quantized_query_similarity(
+                    np_query, self._embeddings_i8
+                )
+            else:
+                similarity_scores = query_similarity(np_query, embeddings)
             similarity_scores = np.nan_to_num(similarity_scores, nan=-np.inf)
         # Support Supabase retrieval
         else:
@@ -162,18 +238,25 @@ class SupabaseStore(VectorStore):
                 query,
                 embedding_model,
                 match_threshold=0,
+                k=k,
                 document_ids=document_ids,
             )
             texts = response_to_text(response_data)
-            similarity_scores = np.array([r["similarity"] for r in response_data])
-        # minus so descending
-        # we could use arg-partition here
-        # but a lot of algorithms expect a sorted list
-        sorted_indices = np.argsort(-similarity_scores)
-        return (
-            [texts[i] for i in sorted_indices[:k]],
-            [similarity_scores[i] for i in sorted_indices[:k]],
-        )
+            similarity_scores = np.array(
+                [r["similarity"] for r in response_data], dtype=np.float32
+            )
+        # Partition out the top k, then sort only those
+        # since a lot of algorithms expect a sorted list
+        if k < len(similarity_scores):
+            sorted_indices = np.argpartition(similarity_scores, -k)[-k:]
+            sorted_indices = sorted_indices[
+                np.argsort(similarity_scores[sorted_indices])[::-1]
+            ]
+        else:
+            # reversed so descending, without materializing -similarity_scores
+            sorted_indices = np.argsort(similarity_scores)[::-1]
+        top = sorted_indices[:k]
+        return [texts[i] for i in top], similarity_scores[top].tolist()
 
     # Modification of MMRS with added policy filter
     async def max_marginal_relevance_search(
@@ -204,56 +287,46 @@ class SupabaseStore(VectorStore):
         if len(texts) <= k or self.mmr_lambda >= 1.0:
             return texts, scores
 
-        embeddings = np.array([t.embedding for t in texts])
-        np_scores = np.array(scores)
-        similarity_matrix = cosine_similarity(embeddings, embeddings)
-
-        selected_indices = [0]
-        remaining_indices = list(range(1, len(texts)))
-
-        while len(selected_indices) < k:
-            selected_similarities = similarity_matrix[:, selected_indices]
-            max_sim_to_selected = selected_similarities.max(axis=1)
-
-            mmr_scores = (
-                self.mmr_lambda * np_scores
-                - (1 - self.mmr_lambda) * max_sim_to_selected
-            )
-            mmr_scores[selected_indices] = -np.inf  # Exclude already selected documents
-
-            max_mmr_index = mmr_scores.argmax()
-            selected_indices.append(max_mmr_index)
-            remaining_indices.remove(max_mmr_index)
+        selected_indices = maximal_marginal_relevance(
+            [t.embedding for t in texts], scores, k, self.mmr_lambda
+        )
 
         return [texts[i] for i in selected_indices], [
             scores[i] for i in selected_indices
         ]
 
     async def get_existing_dockeys(self) -> List[str]:
-        supabase = await create_async_client(self.supabase_url, self.supabase_key)
+        supabase = await self._get_client()
 
-        start = 0
+        # Fetch the first page along with the row count, so that the remaining
+        # pages can be fetched concurrently. A head request would be lighter, but
+        # postgrest drops the count when the response body is empty
         batchsize = 1000
-        data = []
-        while True:
-            response = (
-                await supabase.table("documents")
+        first = (
+            await supabase.table("documents")
+            .select("id", count="exact")
+            .range(0, batchsize - 1)
+            .execute()
+        )
+        responses = await gather_with_concurrency(
+            n=8,
+            coros=[
+                supabase.table("documents")
                 .select("id")
                 .range(start, start + batchsize - 1)
                 .execute()
-            )
-            data += response.data
-            if len(response.data) < batchsize:
-                break
+                for start in range(batchsize, first.count or 0, batchsize)
+            ],
+        )
 
-        return [r["id"] for r in data]
+        return [r["id"] for response in [first, *responses] for r in response.data]
 
     async def upload(
         self,
         doc: Doc,
         ignore_duplicate_doc=False,
     ):
-        supabase = await create_async_client(self.supabase_url, self.supabase_key)
+        supabase = await self._get_client()
 
         # Upload document to `documents` table
         try:
@@ -289,7 +362,4 @@ class SupabaseStore(VectorStore):
             else:
                 raise e
 
-        await gather_with_concurrency(
-            n=4,
-            coros=[upload_chunk(t, supabase) for t in doc.texts],
-        )
+        await upload_chunks(doc.texts, supabase)
@@ -1,22 +1,32 @@
+from collections.abc import Sequence
+from typing import Any
+
 from supabase._async.client import AsyncClient
 
 from ..reader.doc import Text
 
 
-async def upload_chunk(chunk: Text, supabase: AsyncClient):
-    response = (
-        await supabase.table("chunks")
-        .insert(
-            {
-                "document": chunk.doc.dockey,
-                "pages": chunk.pages,
-                "text": chunk.text,
-                "text_emb": chunk.embedding,
-                "summary": chunk.summary,
-                "points": [p.dict() for p in chunk.points],
-            }
+def chunk_to_row(chunk: Text) -> dict[str, Any]:
+    return {
+        "document": chunk.doc.dockey,
+        "pages": chunk.pages,
+        "text": chunk.text,
+        "text_emb": chunk.embedding,
+        "summary": chunk.summary,
+        "points": [p.dict() for p in chunk.points],
+    }
+
+
+async def upload_chunks(
+    chunks: Sequence[Text], supabase: AsyncClient, batch_size: int = 500
+):
+    # Insert many rows per request instead of one round-trip per chunk
+    for start in range(0, len(chunks), batch_size):
+        batch = chunks[start : start + batch_size]
+        response = (
+            await supabase.table("chunks")
+            .insert([chunk_to_row(chunk) for chunk in batch])
+            .execute()
         )
-        .execute()
-    )
-    if not len(response.data):
-        raise ValueError("Chunk not inserted")
+        if len(response.data) < len(batch):
+            raise ValueError("Chunks not inserted")
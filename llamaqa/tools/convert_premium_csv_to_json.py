@@ -2,6 +2,11 @@ import json
 
 import pandas as pd
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 def parse_header(header):
     """Parse the column header to extract company and plan."""
@@ -18,46 +23,55 @@ def csv_to_json(csv_path, json_file_path):
 
     # Process data
     df = pd.read_csv(csv_path)
-    for _, row in df.iterrows():
-        age = str(row["Age Next Birthday"])  # Age as a string to match the JSON format
-        if age == ">100":
-            age = "Over 100"
+    # Age as a string to match the JSON format
+    ages = df["Age Next Birthday"].astype(str).replace(">100", "Over 100")
+    medishield_premiums = df[
+        "MediShield Life Premiums (Fully payable by Medisave)"
+    ].astype(float)
+    withdrawal_limits = df["Additional Withdrawal Limits (AWLs)"].astype(float)
+
+    # Skip 'Age', 'MediShield Life Premiums', and 'AWLs'
+    headers = [(col, *parse_header(col)) for col in df.columns[3:]]
+    headers = [
+        (col, company, plan) for col, company, plan in headers if company and plan
+    ]
+    raw = df[[col for col, _, _ in headers]]
+    # Convert the values to numeric types column-wise, coercing errors to NaN
+    numeric = raw.apply(pd.to_numeric, errors="coerce")
+    # Keep numbers as floats, otherwise keep the value as a string
+    premiums = (
+        numeric.astype(float).astype(object).where(numeric.notna(), raw.astype(str))
+    )
 
+    for age, medishield_premium, withdrawal_limit, row in zip(
+        ages,
+        medishield_premiums,
+        withdrawal_limits,
+        premiums.itertuples(index=False, name=None),
+        strict=True,
+    ):
         # Initialize the age-specific data
         if age not in structured_data:
             structured_data[age] = {
-                "medishield_premium": float(
-                    row["MediShield Life Premiums (Fully payable by Medisave)"]
-                ),
-                "additional_withdrawal_limit": float(
-                    row["Additional Withdrawal Limits (AWLs)"]
-                ),
+                "medishield_premium": medishield_premium,
+                "additional_withdrawal_limit": withdrawal_limit,
                 "companies": {},
             }
 
-        # Process each company-plan column in the data row
-        for col in df.columns[3:]:  # Skip 'Age', 'MediShield Life Premiums', and 'AWLs'
-            company, plan = parse_header(col)
-            if company and plan:
-                if company not in structured_data[age]["companies"]:
-                    structured_data[age]["companies"][company] = {}
-                if plan not in structured_data[age]["companies"][company]:
-                    structured_data[age]["companies"][company][plan] = {}
-
-                # Convert the value to a numeric type, coercing errors to NaN
-                value = pd.to_numeric(row[col], errors="coerce")
-                if pd.notna(value):  # If the value is a number
-                    structured_data[age]["companies"][company][plan][
-                        "additional_insurance_premium"
-                    ] = float(value)
-                else:  # If the value is not a number, keep it as a string
-                    structured_data[age]["companies"][company][plan][
-                        "additional_insurance_premium"
-                    ] = str(row[col])
+        companies = structured_data[age]["companies"]
+        for (_, company, plan), value in zip(headers, row, strict=True):
+            companies.setdefault(company, {}).setdefault(plan, {})[
+                "additional_insurance_premium"
+            ] = value
 
     # Write the structured data to a JSON file
-    with open(json_file_path, "w") as jsonfile:
-        json.dump(structured_data, jsonfile, indent=4)
+    if orjson is not None:
+        # orjson serializes in native code, but only supports 2-space indents
+        with open(json_file_path, "wb") as jsonfile:
+            jsonfile.write(orjson.dumps(structured_data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(json_file_path, "w") as jsonfile:
+            json.dump(structured_data, jsonfile, indent=4)
 
 
 # Example usage
@@ -22,7 +22,6 @@ class DummyToolSpec(BaseToolSpec):
     cache = Cache()
     embedding_model: EmbeddingModel
     summary_llm_model: LLMModel
-    current_task_id: str = ""
 
     def __init__(
         self,
@@ -1,6 +1,9 @@
 from functools import partial
-from typing import Optional, cast
+from typing import Hashable, List, Optional, cast
 
+import numpy as np
+
+from ..store.store import normalize_embeddings, query_similarity
 from ..store.supabase_store import SupabaseStore
 from ..utils.cache import Cache
 from ..utils.context import Context
@@ -29,6 +32,56 @@ SUMMARY_JSON_PROMPT = (
     "Excerpt from {citation}\n\n----\n\n{text}\n\n----\n\nQuestion: {question}\n\n"
 )
 
+# Upper bound on concurrent summary LLM calls, high enough to cover typical k
+MAX_SUMMARY_CONCURRENCY = 16
+
+# Evidence for a query is reused for later queries whose embeddings are at least
+# this similar, keeping the most recent queries per (embedding model, policy)
+EVIDENCE_CACHE_SIZE = 256
+EVIDENCE_CACHE_THRESHOLD = 0.95
+
+
+class EvidenceCache:
+    """Recently gathered evidence, looked up by query embedding similarity."""
+
+    def __init__(
+        self,
+        size: int = EVIDENCE_CACHE_SIZE,
+        threshold: float = EVIDENCE_CACHE_THRESHOLD,
+    ):
+        self.size = size
+        self.threshold = threshold
+        # Per key, a ring buffer of normalized query embeddings and their evidence
+        self._embeddings: dict[Hashable, np.ndarray] = {}
+        self._summaries: dict[Hashable, List[List[Context]]] = {}
+        self._next: dict[Hashable, int] = {}
+
+    def get(self, key: Hashable, embedding: List[float]) -> Optional[List[Context]]:
+        summaries = self._summaries.get(key)
+        if not summaries:
+            return None
+        scores = query_similarity(embedding, self._embeddings[key][: len(summaries)])
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return [summary.model_copy(deep=True) for summary in summaries[best]]
+
+    def add(
+        self, key: Hashable, embedding: List[float], summaries: List[Context]
+    ) -> None:
+        if key not in self._embeddings:
+            self._embeddings[key] = np.empty((self.size, len(embedding)), np.float32)
+            self._summaries[key] = []
+            self._next[key] = 0
+        i = self._next[key]
+        self._embeddings[key][i] = normalize_embeddings([embedding])[0]
+        summaries = [summary.model_copy(deep=True) for summary in summaries]
+        if i < len(self._summaries[key]):
+            self._summaries[key][i] = summaries
+        else:
+            self._summaries[key].append(summaries)
+        self._next[key] = (i + 1) % self.size
+
 
 class EmptyDocsError(RuntimeError):
     """Error to throw when we needed docs to be present."""
@@ -44,6 +97,7 @@ async def gather_evidence(
     embedding_model=None,
     summary_llm_model=None,
     prefix: str = "",
+    evidence_cache: Optional[EvidenceCache] = None,
 ):
     """
     Gather evidence from previous papers given a specific question to increase evidence and relevant paper counts.
@@ -79,39 +133,50 @@ async def gather_evidence(
         ]
     # Use vector retrieval
     else:
-        matches = (
-            await store.max_marginal_relevance_search(
-                query,
-                k=k,
-                fetch_k=2 * k,
-                embedding_model=embedding_model,
-                policies=[policy] if policy is not None else None,
-            )
-        )[0]
-
-        prompt_runner = partial(
-            summary_llm_model.run_prompt,
-            SUMMARY_JSON_PROMPT,
-            system_prompt=SUMMARY_JSON_SYSTEM_PROMPT,
-        )
-
-        results = await gather_with_concurrency(
-            n=4,
-            coros=[
-                map_fxn_summary(
-                    text=m,
-                    question=query,
-                    prompt_runner=prompt_runner,
-                    extra_prompt_data={
-                        "summary_length": "about 100 words",
-                        "citation": f"{m.name}: {m.doc.citation}",
-                    },
-                    parser=llm_parse_json,
+        # Reuse evidence gathered for a near-identical query, if any
+        summaries = None
+        if evidence_cache is not None:
+            query_embedding = await embedding_model.embed_query(query)
+            cache_key = (embedding_model.name, policy)
+            summaries = evidence_cache.get(cache_key, query_embedding)
+        if summaries is not None:
+            matches = summaries
+        else:
+            matches = (
+                await store.max_marginal_relevance_search(
+                    query,
+                    k=k,
+                    fetch_k=2 * k,
+                    embedding_model=embedding_model,
+                    policies=[policy] if policy is not None else None,
                 )
-                for m in matches
-            ],
-        )
-        summaries = [cast(Context, summary) for summary, _ in results]
+            )[0]
+
+            prompt_runner = partial(
+                summary_llm_model.run_prompt,
+                SUMMARY_JSON_PROMPT,
+                system_prompt=SUMMARY_JSON_SYSTEM_PROMPT,
+            )
+
+            results = await gather_with_concurrency(
+                n=MAX_SUMMARY_CONCURRENCY,
+                coros=[
+                    map_fxn_summary(
+                        text=m,
+                        question=query,
+                        prompt_runner=prompt_runner,
+                        extra_prompt_data={
+                            "summary_length": "about 100 words",
+                            "citation": f"{m.name}: {m.doc.citation}",
+                        },
+                        parser=llm_parse_json,
+                    )
+                    for m in matches
+                ],
+            )
+            summaries = [cast(Context, summary) for summary, _ in results]
+            if evidence_cache is not None:
+                evidence_cache.add(cache_key, query_embedding, summaries)
 
     for summary in summaries:
         summary.text.name = prefix + summary.text.name
@@ -40,3 +40,10 @@ INSURANCE_PLANS = {
         "Standard Class B1": "Singlife Shield Standard Plan",
     },
 }
+
+# Reverse index of plan name to (company, coverage)
+PLAN_COVERAGE = {
+    name: (company, coverage)
+    for company, plans in INSURANCE_PLANS.items()
+    for coverage, name in plans.items()
+}
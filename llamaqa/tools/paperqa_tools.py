@@ -1,7 +1,9 @@
 import asyncio
-from typing import List, Optional
+import functools
+from typing import Dict, List, Optional, Tuple
 
-from llama_index.core.tools.tool_spec.base import BaseToolSpec
+from llama_index.core.tools.tool_spec.base import SPEC_FUNCTION_TYPE, BaseToolSpec
+from llama_index.core.tools.types import ToolMetadata
 
 from ..llms.embedding_model import EmbeddingModel
 from ..llms.llm_model import LLMModel
@@ -9,16 +11,45 @@ from ..store.store import VectorStore
 from ..utils.cache import Cache
 from ..utils.logger import CostLogger
 from ..utils.policies import VALID_POLICIES
-from .gather_evidence import gather_evidence
+from .gather_evidence import EvidenceCache, gather_evidence
 from .retrieve_evidence import retrieve_evidence
 from .retrieve_policy_plans_and_riders import retrieve_policy_plans_and_riders
 from .retrieve_premiums import VALID_COVERAGE, VALID_PLANS, retrieve_premiums
-from .utils import tool_metadata
+from .utils import current_task_id, tool_metadata
+
+POLICY_COMPANIES = {
+    "NTUC Income IncomeShield Standard": "Income",
+    "NTUC Income Enhanced IncomeShield": "Income",
+    "NTUC Income IncomeShield": "Income",
+    "AIA HealthShield Gold Max": "AIA",
+    "Great Eastern GREAT SupremeHealth": "Great Eastern",
+    "HSBC Life Shield": "HSBC",
+    "Prudential PRUShield": "Prudential",
+    "Raffles Shield": "Raffles",
+    "Singlife Shield": "Singlife",
+}
+DEFAULT_PREMIUM_AGES = (10, 30, 50, 70)
+
+# Tool metadata per (toolspec class, function name)
+_TOOL_METADATA: Dict[Tuple[type, str], Optional[ToolMetadata]] = {}
+
+
+@functools.lru_cache(maxsize=256)
+def render_premiums_table(ages, companies, plans, coverages) -> str:
+    """Render the premiums table, memoized on the (hashable) tool arguments."""
+    return retrieve_premiums(
+        *(
+            list(arg) if isinstance(arg, tuple) else arg
+            for arg in (ages, companies, plans, coverages)
+        ),
+        format="table",
+    )
 
 
 class PaperQAToolSpec(BaseToolSpec):
     spec_functions = [
         "gather_evidence_by_query",
+        "gather_evidence_by_queries",
         "gather_policy_overview",
         "retrieve_evidence",
         "retrieve_policy_plans_and_riders",
@@ -28,8 +59,13 @@ class PaperQAToolSpec(BaseToolSpec):
     cache: Cache
     embedding_model: EmbeddingModel
     summary_llm_model: LLMModel
-    current_task_id: str = ""
     cost_logger: CostLogger
+    # Evidence of near-identical queries against this store, None if disabled
+    evidence_cache: Optional[EvidenceCache]
+    # Evidence gathered (or being gathered) in the current task, by (query, policy)
+    _turn_cache: Dict[
+        str, Dict[Tuple[Optional[str], Optional[str]], "asyncio.Task[str]"]
+    ]
 
     def __init__(
         self,
@@ -38,6 +74,7 @@ class PaperQAToolSpec(BaseToolSpec):
         embedding_model: EmbeddingModel,
         summary_llm_model: LLMModel,
         cost_logger: Optional[CostLogger] = None,
+        evidence_cache: bool = True,
     ):
         super().__init__()
         self.store = store
@@ -45,6 +82,56 @@ class PaperQAToolSpec(BaseToolSpec):
         self.embedding_model = embedding_model
         self.summary_llm_model = summary_llm_model
         self.cost_logger = cost_logger or CostLogger()
+        self.evidence_cache = EvidenceCache() if evidence_cache else None
+        self._turn_cache = {}
+
+    async def _gather_evidence(
+        self, query: Optional[str], policy: Optional[str]
+    ) -> str:
+        task_id = current_task_id.get()
+        if task_id not in self._turn_cache:
+            # A new task has started, so drop the responses of earlier tasks
+            self._turn_cache = {task_id: {}}
+        gathered = self._turn_cache[task_id]
+
+        # Keep the task rather than its result, so a call repeated while the
+        # first is still running waits on it instead of summarizing again
+        key = (query.strip().lower() if query is not None else None, policy)
+        if key not in gathered:
+            task = asyncio.ensure_future(
+                gather_evidence(
+                    self.cache,
+                    self.store,
+                    query=query,
+                    policy=policy,
+                    embedding_model=self.embedding_model,
+                    summary_llm_model=self.summary_llm_model,
+                    prefix=task_id,
+                    evidence_cache=self.evidence_cache,
+                )
+            )
+
+            def evict_failed(task: "asyncio.Task[str]") -> None:
+                # Let a later call retry rather than repeat the failure
+                if task.cancelled() or task.exception() is not None:
+                    gathered.pop(key, None)
+
+            task.add_done_callback(evict_failed)
+            gathered[key] = task
+        # Shield so one caller being cancelled does not cancel the others
+        return await asyncio.shield(gathered[key])
+
+    def get_metadata_from_fn_name(
+        self, fn_name: str, spec_functions: Optional[List[SPEC_FUNCTION_TYPE]] = None
+    ) -> Optional[ToolMetadata]:
+        # Descriptions and schemas depend only on the method, so build them once
+        # rather than for every agent created by from_config
+        key = (type(self), fn_name)
+        if key not in _TOOL_METADATA:
+            _TOOL_METADATA[key] = super().get_metadata_from_fn_name(
+                fn_name, spec_functions=spec_functions
+            )
+        return _TOOL_METADATA[key]
 
     @tool_metadata(
         desc=f"""
@@ -55,7 +142,7 @@ Args:
 """,
         output_desc="Retrieving plans and riders for {policies}...",
     )
-    def retrieve_policy_plans_and_riders(self, policies: List[str]) -> str:
+    async def retrieve_policy_plans_and_riders(self, policies: List[str]) -> str:
         return retrieve_policy_plans_and_riders(
             policies,
         )
@@ -81,25 +168,49 @@ Args:
         output_desc='Retrieving information with query "{query}" on policy "{policy}"...',
         default_kwargs={"policy": None},
     )
-    def gather_evidence_by_query(
+    async def gather_evidence_by_query(
         self,
         query: str,
         policy: Optional[str] = None,
     ) -> str:
-        async def gather_evidence_helper():
-            response = await gather_evidence(
-                self.cache,
-                self.store,
-                query=query,
-                policy=policy,
-                embedding_model=self.embedding_model,
-                summary_llm_model=self.summary_llm_model,
-                prefix=self.current_task_id,
-            )
-            return response
+        return await self._gather_evidence(query, policy)
 
-        loop = asyncio.get_event_loop()
-        return loop.run_until_complete(gather_evidence_helper())
+    @tool_metadata(
+        desc=f"""
+Find and return pieces of evidence for several queries at once,
+where each query is paired with the policy at the same position.
+
+Prefer this over calling gather_evidence_by_query repeatedly,
+e.g. when comparing the same query across different policies.
+This should only be called for queries relevant to insurance.
+Never ever call this tool for queries unrelated to insurance.
+
+valid_policies = {VALID_POLICIES}
+
+Args:
+    queries (List[str]): The queries to search for
+    policies (List[str]) = None: The policy to filter each query by, each must be one of values in valid_policies list or None. If None, defaults to searching all policies for every query.
+""",
+        output_desc="Retrieving information with queries {queries} on policies {policies}...",
+        default_kwargs={"policies": None},
+    )
+    async def gather_evidence_by_queries(
+        self,
+        queries: List[str],
+        policies: Optional[List[Optional[str]]] = None,
+    ) -> str:
+        policies = policies or [None] * len(queries)
+        if len(policies) != len(queries):
+            return "Provide exactly one policy (or None) for each query"
+        # Embed all queries in one request, which the searches below then reuse
+        await self.embedding_model.embed_queries(queries)
+        responses = await asyncio.gather(
+            *(
+                self._gather_evidence(query, policy)
+                for query, policy in zip(queries, policies, strict=True)
+            )
+        )
+        return "\n".join(responses)
 
     @tool_metadata(
         desc=f"""
@@ -114,29 +225,17 @@ Args:
 """,
         output_desc='Retrieving all information about policy "{policy}"...',
     )
-    def gather_policy_overview(
+    async def gather_policy_overview(
         self,
         policy: str,
     ) -> str:
-        async def gather_evidence_helper():
-            response = await gather_evidence(
-                self.cache,
-                self.store,
-                query=None,  # Use query=None to return all information
-                policy=policy,
-                embedding_model=self.embedding_model,
-                summary_llm_model=self.summary_llm_model,
-                prefix=self.current_task_id,
-            )
-            return response
-
-        loop = asyncio.get_event_loop()
-        return loop.run_until_complete(gather_evidence_helper())
+        # Use query=None to return all information
+        return await self._gather_evidence(None, policy)
 
     @tool_metadata(
         output_desc="Retrieving gathered evidence...",
     )
-    def retrieve_evidence(self, question: str) -> str:
+    async def retrieve_evidence(self, question: str) -> str:
         """
         Retrieves the evidence and summaries from earlier steps and
         combine them with the user's question to form an instruction
@@ -187,7 +286,7 @@ Args:
             "coverages": None,
         },
     )
-    def retrieve_premiums(
+    async def retrieve_premiums(
         self,
         ages: Optional[List[int]] = None,
         policies: Optional[List[str]] = None,
@@ -195,28 +294,29 @@ Args:
         coverages: Optional[List[str]] = None,
     ):
         plans = plans or []
-        if "MediShield Life" in policies:
-            plans.append("MediShield Life")
-            policies.remove("MediShield Life")
-        # Map policies to companies
-        policies_map = {
-            "NTUC Income IncomeShield Standard": "Income",
-            "NTUC Income Enhanced IncomeShield": "Income",
-            "NTUC Income IncomeShield": "Income",
-            "AIA HealthShield Gold Max": "AIA",
-            "Great Eastern GREAT SupremeHealth": "Great Eastern",
-            "HSBC Life Shield": "HSBC",
-            "Prudential PRUShield": "Prudential",
-            "Raffles Shield": "Raffles",
-            "Singlife Shield": "Singlife",
-        }
         policies = policies or []
+        if "MediShield Life" in policies:
+            plans = [*plans, "MediShield Life"]
+            policies = [p for p in policies if p != "MediShield Life"]
         if len(policies) > 3:
             return "Only enter up to 3 policies for the retrieve_premiums tool"
-        companies = list(set(policies_map.get(p) for p in policies))
-        # Default ages
-        ages = ages or [10, 30, 50, 70]
-        data = retrieve_premiums(ages, companies, plans, coverages, format="table")
+        # Map policies to companies, skipping unknown policies
+        companies = list(
+            dict.fromkeys(
+                POLICY_COMPANIES[p] for p in policies if p in POLICY_COMPANIES
+            )
+        )
+        if policies and not companies:
+            return f"No premium data found for policies {policies}, which should be from {VALID_POLICIES}"
+        ages = ages or list(DEFAULT_PREMIUM_AGES)
+        # Filtering and rendering the table is CPU-bound, so keep it off the event loop
+        data = await asyncio.to_thread(
+            render_premiums_table,
+            *(
+                tuple(arg) if isinstance(arg, list) else arg
+                for arg in (ages, companies, plans, coverages)
+            ),
+        )
         return f"""
 {data}
 
@@ -1,3 +1,5 @@
+from typing import Iterable
+
 from ..store.store import VectorStore
 from ..utils.cache import Cache
 
@@ -29,6 +31,25 @@ QA_PROMPT = (
 
 EXAMPLE_CITATION: str = "(a4219430Example2012 pages 3-4)"
 EXAMPLE_CITATION_QUOTE: str = "(a4219430Example2012 pages 3-4 quote1, quote2, a4219430Example2012 pages 7-8, a4219430Example2012 pages 10-13 quote1)"
+ANSWER_LENGTH: str = "about 200 words, but can be longer"
+
+# Fill in the fixed fields once and split around the per-call fields,
+# so each call is a plain concatenation instead of a template parse
+_QA_PROMPT_HEAD, _QA_PROMPT_REST = (
+    QA_PROMPT.replace("{example_citation}", EXAMPLE_CITATION)
+    .replace("{example_citation_quote}", EXAMPLE_CITATION_QUOTE)
+    .replace("{answer_length}", ANSWER_LENGTH)
+    .split("{context}")
+)
+_QA_PROMPT_MIDDLE, _QA_PROMPT_TAIL = _QA_PROMPT_REST.split("{question}")
+
+
+def format_qa_prompt(context: str | Iterable[str], question: str) -> str:
+    if isinstance(context, str):
+        context = (context,)
+    return "".join(
+        (_QA_PROMPT_HEAD, *context, _QA_PROMPT_MIDDLE, question, _QA_PROMPT_TAIL)
+    )
 
 
 def retrieve_evidence(
@@ -36,13 +57,5 @@ def retrieve_evidence(
     store: VectorStore,
     query: str,
 ):
-    context_str = cache.get_string()
-    return QA_PROMPT.format(
-        **{
-            "context": context_str,
-            "answer_length": "about 200 words, but can be longer",
-            "question": query,
-            "example_citation": EXAMPLE_CITATION,
-            "example_citation_quote": EXAMPLE_CITATION_QUOTE,
-        }
-    )
+    # Join the context pieces straight into the prompt
+    return format_qa_prompt(cache.iter_chunks(), query)
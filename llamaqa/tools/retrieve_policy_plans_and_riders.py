@@ -149,7 +149,7 @@ POLICY_PLANS_RIDERS = {
             ],
         },
         "A": {
-            "coverage": "Class AB1",
+            "coverage": "Class A",
             "riders": [
                 "Premier Rider",
                 "Key Rider",
@@ -220,15 +220,22 @@ Riders:
 """
 
 
+# Each policy's section is rendered once, since the plans and riders are fixed
+POLICY_SECTIONS = {
+    policy: POLICY_TEMPLATE.format(
+        policy_name=policy,
+        plans_and_riders="".join([PLAN_TEMPLATE.format(
+            plan_name=plan_name,
+            coverage=plan_info["coverage"],
+            coverage_meaning=COVERAGE_MEANINGS[plan_info["coverage"]],
+            riders="\n".join([f"- {r}" for r in plan_info["riders"]]) if len(plan_info["riders"]) else "None",
+        ) for plan_name, plan_info in plans.items()])
+    )
+    for policy, plans in POLICY_PLANS_RIDERS.items()
+}
+
+
 def retrieve_policy_plans_and_riders(policies: List[str]):
     return GENERAL_TEMPLATE.format(
-        policies="\n".join([POLICY_TEMPLATE.format(
-            policy_name=policy,
-            plans_and_riders="".join([PLAN_TEMPLATE.format(
-                plan_name=plan_name,
-                coverage=plan_info["coverage"],
-                coverage_meaning=COVERAGE_MEANINGS[plan_info["coverage"]],
-                riders="\n".join([f"- {r}" for r in plan_info["riders"]]) if len(plan_info["riders"]) else "None",
-            ) for plan_name, plan_info in POLICY_PLANS_RIDERS[policy].items()])
-        ) for policy in policies])
+        policies="\n".join([POLICY_SECTIONS[policy] for policy in policies])
     )
@@ -1,9 +1,8 @@
 from typing import Dict, List, Optional
 
-import pandas as pd
 from dirtyjson.attributed_containers import AttributedList
 
-from .insurance_plans import INSURANCE_PLANS
+from .insurance_plans import INSURANCE_PLANS, PLAN_COVERAGE
 from .premiums_data import PREMIUMS_DATA
 
 VALID_COMPANIES = [
@@ -46,6 +45,11 @@ VALID_PLANS = [
     "Singlife Shield Standard Plan",
 ]
 
+# Sets of the above for validation, as the lists are also shown in tool descriptions
+_VALID_COMPANIES_SET = frozenset(VALID_COMPANIES)
+_VALID_COVERAGE_SET = frozenset(VALID_COVERAGE)
+_VALID_PLANS_SET = frozenset(VALID_PLANS)
+
 COVERAGE_MEANINGS = {
     "Basic": "(Covers most Class B2 or C ward bills)",
     "Standard Class B1": "(Covers most Class B1 ward bills)",
@@ -54,6 +58,78 @@ COVERAGE_MEANINGS = {
     "Private": "(Covers up to standard rooms in private hospitals)",
 }
 
+# Position of each age key in PREMIUMS_DATA, which results are listed in
+AGE_ORDER = {age_key: i for i, age_key in enumerate(PREMIUMS_DATA)}
+
+# Position of each company across PREMIUMS_DATA, which results are listed in
+COMPANY_ORDER = {
+    company_key: i
+    for i, company_key in enumerate(
+        dict.fromkeys(
+            company_key
+            for age_data in PREMIUMS_DATA.values()
+            for company_key in age_data["companies"]
+        )
+    )
+}
+
+# MediShield Life premium and additional withdrawal limit of each age
+AGE_PREMIUMS = {
+    age_key: (
+        age_data.get("medishield_premium", "N/A"),
+        age_data.get("additional_withdrawal_limit", "N/A"),
+    )
+    for age_key, age_data in PREMIUMS_DATA.items()
+}
+
+
+# Helper function to format currency as Singapore Dollars
+def format_currency(value):
+    if isinstance(value, (int, float)) and value != "N/A":
+        return f"${value:,.2f}"
+    return value
+
+
+def cash_outlay(coverage_data: Dict, age_data: Dict):
+    if coverage_data["additional_insurance_premium"] == "Not available":
+        return "Not available"
+    difference = float(coverage_data.get("additional_insurance_premium", 0)) - float(
+        age_data.get("additional_withdrawal_limit", 0)
+    )
+    return max(0, difference)
+
+
+def medisave_payable(coverage_data: Dict, age_data: Dict):
+    if coverage_data["additional_insurance_premium"] == "Not available":
+        return "Up to " + format_currency(age_data["additional_withdrawal_limit"])
+    return format_currency(
+        min(
+            float(coverage_data["additional_insurance_premium"]),
+            age_data["additional_withdrawal_limit"],
+        )
+    )
+
+
+# PREMIUMS_DATA with the cash outlay and MediSave-payable amount
+# of every plan worked out up front
+PREMIUMS_WITH_CASH_OUTLAY = {
+    age_key: {
+        **age_data,
+        "companies": {
+            company_key: {
+                coverage_key: {
+                    **coverage_data,
+                    "cash_outlay": cash_outlay(coverage_data, age_data),
+                    "medisave_payable": medisave_payable(coverage_data, age_data),
+                }
+                for coverage_key, coverage_data in company_data.items()
+            }
+            for company_key, company_data in age_data["companies"].items()
+        },
+    }
+    for age_key, age_data in PREMIUMS_DATA.items()
+}
+
 
 # Filter the data based on the given arguments
 def retrieve_premiums(
@@ -63,7 +139,7 @@ def retrieve_premiums(
     coverage: Optional[List[str]] = None,
     format: str = "list",
 ):
-    data = PREMIUMS_DATA
+    data = PREMIUMS_WITH_CASH_OUTLAY
 
     # Check input types
     for arg, inp in {
@@ -83,86 +159,87 @@ def retrieve_premiums(
     if age and any(a < 1 for a in age):
         return "The provided age is invalid."
     elif (
-        (company and not any(c in VALID_COMPANIES for c in company))
-        or (plan and not any(p in VALID_PLANS for p in plan))
-        or (coverage and not any(c in VALID_COVERAGE for c in coverage))
+        (company and _VALID_COMPANIES_SET.isdisjoint(company))
+        or (plan and _VALID_PLANS_SET.isdisjoint(plan))
+        or (coverage and _VALID_COVERAGE_SET.isdisjoint(coverage))
     ):
         return "No premium data found for the given query because either the provided company, plan, or coverage level is invalid."
 
+    # If age is specified, look up only those ages
     if age:
-        age = ["Over 100" if a > 100 else str(int(a)) for a in age]
-
-    for age_key, age_data in data.items():
-        # If age is specified, filter for those ages
-        if age and age_key not in age:
-            continue
-
-        if age_key not in filtered_data:
-            filtered_data[age_key] = {
-                "medishield_premium": age_data.get("medishield_premium", "N/A"),
-                "additional_withdrawal_limit": age_data.get(
-                    "additional_withdrawal_limit", "N/A"
-                ),
-                "companies": {},
-            }
+        age = {"Over 100" if a > 100 else str(int(a)) for a in age}
+        age_keys = sorted(age & AGE_ORDER.keys(), key=AGE_ORDER.__getitem__)
+    else:
+        age_keys = list(data)
+
+    # MediShield Life only queries leave out the Integrated Shield Plans,
+    # so they need nothing beyond each age's MediShield Life premium
+    if (plan and plan == ["MediShield Life"]) or (coverage and coverage == ["Basic"]):
+        filtered_data = {
+            age_key: {"medishield_premium": AGE_PREMIUMS[age_key][0]}
+            for age_key in age_keys
+        }
+        if format == "table":
+            return prettify_results_to_table(filtered_data)
+        return prettify_results_to_list(filtered_data)
 
-        if (plan and plan == ["MediShield Life"]) or (
-            coverage and coverage == ["Basic"]
-        ):
-            filtered_data[age_key] = {
-                "medishield_premium": age_data.get("medishield_premium", "N/A"),
-            }
-            continue
+    # Work out which coverages to take from each company once, not per age
+    # None means every coverage of the company
+    selection: Dict[str, Optional[List[str]]]
+    if plan:
+        # Group the plans by their company and coverage in PLAN_COVERAGE
+        selection = {}
+        for plan_key in plan:
+            plan_company, plan_coverage = PLAN_COVERAGE.get(plan_key, (None, None))
+            if plan_company is not None:
+                selection.setdefault(plan_company, []).append(plan_coverage)
+    elif company:
+        selection = dict.fromkeys(company, coverage or None)
+    else:
+        selection = dict.fromkeys(COMPANY_ORDER, coverage or None)
+    # Only visit the selected companies, in the order results are listed in
+    selected_companies = sorted(
+        selection.keys() & COMPANY_ORDER.keys(), key=COMPANY_ORDER.__getitem__
+    )
 
-        for company_key, company_data in age_data["companies"].items():
-            # If company is specified and no plan is specified, filter for those companies
-            if company and not plan and company_key not in company:
+    for age_key in age_keys:
+        medishield_premium, additional_withdrawal_limit = AGE_PREMIUMS[age_key]
+        age_data = data[age_key]
+        filtered_data[age_key] = {
+            "medishield_premium": medishield_premium,
+            "additional_withdrawal_limit": additional_withdrawal_limit,
+            "companies": {},
+        }
+
+        for company_key in selected_companies:
+            company_data = age_data["companies"].get(company_key)
+            if company_data is None:
                 continue
+            coverage_keys = selection[company_key]
 
-            plans_data = {}
-            # If plan is specified, filter for those plans
+            # If plan is specified, take those plans
             if plan:
-                # Find the respective company and coverage in INSURANCE_PLANS
-                for plan_key in plan:
-                    if plan_key not in INSURANCE_PLANS.get(company_key, {}).values():
-                        continue
-                    try:
-                        coverage = next(
-                            coverage
-                            for coverage, name in INSURANCE_PLANS[company_key].items()
-                            if name == plan_key
-                        )
-                        plans_data[coverage] = company_data.get(coverage)
-                    except StopIteration:
-                        # If the plan is not found, skip this company
-                        break
-
-            # If coverage is specified but plan is not, filter for those coverages
-            elif coverage:
-                for coverage_key in coverage:
-                    if coverage_key in company_data:
-                        plans_data[coverage_key] = company_data.get(coverage_key)
+                plans_data = {
+                    coverage_key: company_data.get(coverage_key)
+                    for coverage_key in coverage_keys
+                }
+
+            # If coverage is specified but plan is not, take those coverages
+            elif coverage_keys:
+                plans_data = {
+                    coverage_key: company_data[coverage_key]
+                    for coverage_key in coverage_keys
+                    if coverage_key in company_data
+                }
 
             # If neither plan nor coverage is speciified, include all plans under the company
             else:
                 plans_data = company_data
 
-            if company_key not in filtered_data[age_key]["companies"] and plans_data:
-                filtered_data[age_key]["companies"][company_key] = {}
-
-            for coverage_key, coverage_data in plans_data.items():
-                if coverage_data["additional_insurance_premium"] != "Not available":
-                    difference = float(
-                        coverage_data.get("additional_insurance_premium", 0)
-                    ) - float(age_data.get("additional_withdrawal_limit", 0))
-                    coverage_data["cash_outlay"] = max(0, difference)
-                else:
-                    coverage_data["cash_outlay"] = "Not available"
-
+            if plans_data:
                 # Add the selected plans data (all plans if 'plan' is not specified) to the filtered data dictionary
-                filtered_data[age_key]["companies"][company_key][
-                    coverage_key
-                ] = coverage_data
+                # The filtered data is only rendered, so it can share the precomputed dicts
+                filtered_data[age_key]["companies"][company_key] = plans_data
 
     if format == "table":
         return prettify_results_to_table(filtered_data)
@@ -170,48 +247,65 @@ def retrieve_premiums(
         return prettify_results_to_list(filtered_data)
 
 
-# Helper function to format currency as Singapore Dollars
-def format_currency(value):
-    if isinstance(value, (int, float)) and value != "N/A":
-        return f"${value:,.2f}"
-    return value
-
-
 def prettify_results_to_list(filtered_data: Dict):
     if not all("companies" in filtered_data[age_key] for age_key in filtered_data):
-        message = ""
+        parts = []
         for age, age_data in filtered_data.items():
-            message += (
+            parts.append(
                 f"Age: {age}\n"
                 f"  MediShield Life premium (Fully payable by Medisave): {format_currency(age_data['medishield_premium'])}\n"
             )
-        message += "\nAge refers to your age on your next birthday because the insurance will cover your risk for the year ahead."
-        return message
+        parts.append("\nAge refers to your age on your next birthday because the insurance will cover your risk for the year ahead.")
+        return "".join(parts)
 
     else:
-        message = "The premiums for Integrated Shield Plans consist of the MediShield Life premium and the additional private insurance premium.\n\n"
+        parts = ["The premiums for Integrated Shield Plans consist of the MediShield Life premium and the additional private insurance premium.\n\n"]
         for age, age_data in filtered_data.items():
-            message += (
+            parts.append(
                 f"Age: {age}\n"
                 f"  MediShield Life premiums (Fully payable with Medisave): {format_currency(age_data['medishield_premium'])}\n"
                 f"  You can use also MediSave to pay for the additional private insurance premium: Up to {format_currency(age_data['additional_withdrawal_limit'])}\n"
             )
             for company, company_data in age_data["companies"].items():
-                message += f"  Company: {company}\n"
+                parts.append(f"  Company: {company}\n")
 
                 for coverage, coverage_data in company_data.items():
-                    message += (
+                    parts.append(
                         f"    Plan: {INSURANCE_PLANS[company][coverage]}\n"
                         f"      Additional private insurance premium: {format_currency(coverage_data['additional_insurance_premium'])}\n"
-                        f"        Of which, you can pay with MediSave: {format_currency(min(float(coverage_data['additional_insurance_premium']), age_data['additional_withdrawal_limit']) if coverage_data['additional_insurance_premium'] != 'Not available' else 'Up to ' + format_currency(age_data['additional_withdrawal_limit']))}\n"
+                        f"        Of which, you can pay with MediSave: {coverage_data['medisave_payable']}\n"
                         f"        The remaining amount to be paid in cash: {format_currency(coverage_data['cash_outlay'])}\n"
                     )
-        message += "\nNote: Age refers to your age on your next birthday because the insurance will cover your risk for the year ahead."
-        return message
+        parts.append("\nNote: Age refers to your age on your next birthday because the insurance will cover your risk for the year ahead.")
+        return "".join(parts)
+
+
+def rows_to_markdown(rows: List[Dict]) -> str:
+    # Same pipe table as tabulate(rows, headers="keys", tablefmt="pipe") gives
+    # for the plain ASCII cells here, without its per-cell type and display
+    # width detection: columns of whole numbers are right-aligned, others left
+    header_cells, separators, columns = [], [], []
+    for header in rows[0]:
+        cells = [str(row[header]).strip() for row in rows]
+        width = max(len(header) + 2, *map(len, cells))
+        if all(cell.isdigit() for cell in cells):
+            header_cells.append(header.rjust(width))
+            separators.append("-" * (width + 1) + ":")
+            columns.append([cell.rjust(width) for cell in cells])
+        else:
+            header_cells.append(header.ljust(width))
+            separators.append(":" + "-" * (width + 1))
+            columns.append([cell.ljust(width) for cell in cells])
+    lines = [
+        f"| {' | '.join(header_cells)} |",
+        f"|{'|'.join(separators)}|",
+        *(f"| {' | '.join(cells)} |" for cells in zip(*columns, strict=True)),
+    ]
+    return "\n".join(lines)
 
 
 def prettify_results_to_table(filtered_data: Dict):
-    table_results = ""
+    table_results = []
 
     if not all("companies" in filtered_data[age_key] for age_key in filtered_data):
         rows = []
@@ -226,8 +320,8 @@ def prettify_results_to_table(filtered_data: Dict):
             rows.append(row)
 
         if rows:
-            table = pd.DataFrame(rows).to_markdown(index=False)
-            table_results += f"{plan_title}{table}\n\n"
+            table = rows_to_markdown(rows)
+            table_results.append(f"{plan_title}{table}\n\n")
 
     elif all(
         len(details.get("companies", {})) == 1
@@ -246,15 +340,15 @@ def prettify_results_to_table(filtered_data: Dict):
                         ),
                         "Additional private insurance premium (Payable with MediSave and cash)": (
                             f"**Total**: {format_currency(coverage_data['additional_insurance_premium'])}<br>"
-                            f"**Payable with MediSave**: {format_currency(min(float(coverage_data['additional_insurance_premium']), age_data['additional_withdrawal_limit']) if coverage_data['additional_insurance_premium'] != 'Not available' else 'Up to ' + format_currency(age_data['additional_withdrawal_limit']))}<br>"
+                            f"**Payable with MediSave**: {coverage_data['medisave_payable']}<br>"
                             f"**Cash payment required**: {format_currency(coverage_data['cash_outlay'])}"
                         ),
                     }
                     rows.append(row)
 
         if rows:
-            table = pd.DataFrame(rows).to_markdown(index=False)
-            table_results += f"{plan_title}{table}\n"
+            table = rows_to_markdown(rows)
+            table_results.append(f"{plan_title}{table}\n")
 
     else:
         for age, age_data in filtered_data.items():
@@ -269,19 +363,20 @@ def prettify_results_to_table(filtered_data: Dict):
                         ),
                         "Additional private insurance premium (Payable with MediSave and cash)": (
                             f"**Total**: {format_currency(coverage_data['additional_insurance_premium'])}<br>"
-                            f"**Payable with MediSave**: {format_currency(min(float(coverage_data['additional_insurance_premium']), age_data['additional_withdrawal_limit']) if coverage_data['additional_insurance_premium'] != 'Not available' else 'Up to ' + format_currency(age_data['additional_withdrawal_limit']))}<br>"
+                            f"**Payable with MediSave**: {coverage_data['medisave_payable']}<br>"
                             f"**Cash payment required**: {format_currency(coverage_data['cash_outlay'])}"
                         ),
                     }
                     rows.append(row)
 
             if rows:
-                table = pd.DataFrame(rows).to_markdown(index=False)
-                table_results += f"{age_title}{table}\n\n"
+                table = rows_to_markdown(rows)
+                table_results.append(f"{age_title}{table}\n\n")
 
     age_note = "\nNote: Age refers to your age on your next birthday because the insurance will cover your risk for the year ahead."
 
-    return table_results + age_note
+    table_results.append(age_note)
+    return "".join(table_results)
 
 
 def main():
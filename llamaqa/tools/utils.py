@@ -1,4 +1,6 @@
 import functools
+import inspect
+from contextvars import ContextVar
 from typing import Any, Callable, Dict, Optional
 
 from llamaqa.llms.llm_result import LLMResult
@@ -7,6 +9,10 @@ from ..reader.doc import Text
 from ..utils.context import Context
 from ..utils.utils import extract_score, strip_citations
 
+# Prefix for the names of texts gathered by the current agent task. Each request
+# (and each asyncio task spawned from it) sees its own value
+current_task_id: ContextVar[str] = ContextVar("current_task_id", default="")
+
 
 def output_descriptor(desc: str):
     def decorator_add_descriptor(func: Callable):
@@ -31,6 +37,15 @@ def tool_metadata(
         func.__output_desc__ = output_desc
         func.__default_kwargs__ = default_kwargs
 
+        # Keep coroutine functions async so LlamaIndex registers them as async tools
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await func(*args, **kwargs)
+
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             return func(*args, **kwargs)
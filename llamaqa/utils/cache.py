@@ -1,9 +1,12 @@
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional
 
 from ..reader.doc import Point
 from .context import Context
 
 CONTEXT_OUTER_PROMPT = "{context_str}\n\nValid Keys: {valid_keys}"
+# CONTEXT_OUTER_PROMPT split around its fields, for Cache.iter_chunks
+_OUTER_PROMPT_HEAD, _OUTER_PROMPT_REST = CONTEXT_OUTER_PROMPT.split("{context_str}")
+_OUTER_PROMPT_MIDDLE, _OUTER_PROMPT_TAIL = _OUTER_PROMPT_REST.split("{valid_keys}")
 CONTEXT_INNER_PROMPT = "{name}: {text}\nFrom {citation}"
 
 
@@ -26,28 +29,37 @@ class Cache:
         filtered_contexts = [c for c in filtered_contexts if c.score > 0]
         return filtered_contexts  # [: (max_sources if max_sources is not None else self.max_sources) ]
 
-    def get_string(self, max_sources: Optional[int] = None) -> str:
+    def filtered_contexts_by_name(
+        self, max_sources: Optional[int] = None
+    ) -> Dict[str, Context]:
+        # later contexts with the same name take precedence
+        return {c.text.name: c for c in self.filtered_contexts(max_sources)}
+
+    def iter_chunks(self, max_sources: Optional[int] = None) -> Iterator[str]:
+        """Yield the pieces of `get_string` in order, without joining them."""
+
         def format_quotes(points: List[Point]) -> str:
             if not points:
                 return ""
             return "\nRelevant quotes:\n" + "\n".join(
-                f'quote{i+1}: "{p.quote}"' for i, p in enumerate(points)
+                f'quote{i + 1}: "{p.quote}"' for i, p in enumerate(points)
             )
 
-        inner_context_strs = [
-            CONTEXT_INNER_PROMPT_WITH_QUOTE.format(
+        filtered_contexts = self.filtered_contexts(max_sources)
+        yield _OUTER_PROMPT_HEAD
+        for i, c in enumerate(filtered_contexts):
+            if i:
+                yield "\n\n"
+            yield CONTEXT_INNER_PROMPT_WITH_QUOTE.format(
                 name=c.text.name,
                 text=c.context,
                 quotes=format_quotes(c.points),
                 citation=c.text.doc.citation,
                 **(c.model_extra or {}),
             )
-            for c in self.filtered_contexts(max_sources)
-        ]
-        context_str = CONTEXT_OUTER_PROMPT.format(
-            context_str="\n\n".join(inner_context_strs),
-            valid_keys=", ".join(
-                [c.text.name for c in self.filtered_contexts(max_sources)]
-            ),
-        )
-        return context_str
+        yield _OUTER_PROMPT_MIDDLE
+        yield ", ".join([c.text.name for c in filtered_contexts])
+        yield _OUTER_PROMPT_TAIL
+
+    def get_string(self, max_sources: Optional[int] = None) -> str:
+        return "".join(self.iter_chunks(max_sources))